@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import threading
+
+# NumPy is optional and takes longer to import than a small allocation; xApps import it on a background thread
+# at start-up (preload_numpy), and allocate() uses plain Python until it is loaded or if it is missing
+np = None
+numpy_available = None
+numpy_lock = threading.Lock()
+
+# Below this many UEs the array setup costs more than the plain Python loops
+NUMPY_MIN_UES = 256
+
+# Rounding rules, shared by both implementations:
+#   - the PRBs of an E2 node are split among its slices as floor(prbCount * weight / sum of weights), and the
+#     last slice of the node gets the rounding remainder
+#   - the PRBs of a slice are split equally among its UEs, and the first UEs get one PRB of the remainder each
+
+
+def load_numpy(blocking=True):
+    """Import NumPy if it is not imported yet; returns whether it is available.
+
+    Without blocking, returns False at once while another thread is importing it.
+    """
+    global np, numpy_available
+    if numpy_available is None:
+        if not numpy_lock.acquire(blocking):
+            return False
+        try:
+            if numpy_available is None:
+                import numpy
+                np = numpy
+                numpy_available = True
+        except ImportError:
+            numpy_available = False
+        finally:
+            numpy_lock.release()
+    return numpy_available
+
+
+def preload_numpy():
+    """Start importing NumPy on a background thread, so that the first large allocation does not wait for it."""
+    threading.Thread(target=load_numpy, name="numpy-import", daemon=True).start()
+
+
+def allocate_python(prbCounts, sliceNodes, sliceWeights, sliceUeCounts):
+    """Plain Python reference implementation of allocate(); returns lists."""
+    weightSums = [0] * len(prbCounts)
+    lastSlice = [None] * len(prbCounts)
+    for sliceIndex, (node, weight) in enumerate(zip(sliceNodes, sliceWeights)):
+        weightSums[node] += weight
+        lastSlice[node] = sliceIndex
+
+    sliceAllocations = [prbCounts[node] * weight // weightSums[node] if weightSums[node] else 0
+                        for node, weight in zip(sliceNodes, sliceWeights)]
+    allocatedPerNode = [0] * len(prbCounts)
+    for node, prbs in zip(sliceNodes, sliceAllocations):
+        allocatedPerNode[node] += prbs
+    for node, sliceIndex in enumerate(lastSlice):
+        if sliceIndex is not None:
+            sliceAllocations[sliceIndex] += prbCounts[node] - allocatedPerNode[node]
+
+    ueAllocations = []
+    for prbs, ueCount in zip(sliceAllocations, sliceUeCounts):
+        if ueCount:
+            prbPerUe, remainder = divmod(prbs, ueCount)
+            ueAllocations.extend(prbPerUe + 1 if i < remainder else prbPerUe for i in range(ueCount))
+    return sliceAllocations, ueAllocations
+
+
+def allocate_numpy(prbCounts, sliceNodes, sliceWeights, sliceUeCounts):
+    """Vectorized allocate(); returns int64 arrays."""
+    prbCounts = np.asarray(prbCounts, dtype=np.int64)
+    sliceNodes = np.asarray(sliceNodes, dtype=np.int64)
+    sliceWeights = np.asarray(sliceWeights, dtype=np.int64)
+    sliceUeCounts = np.asarray(sliceUeCounts, dtype=np.int64)
+    if len(sliceNodes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    weightSums = np.bincount(sliceNodes, weights=sliceWeights, minlength=len(prbCounts)).astype(np.int64)
+    sliceWeightSums = weightSums[sliceNodes]
+    sliceAllocations = np.where(sliceWeightSums > 0,
+                                prbCounts[sliceNodes] * sliceWeights // np.maximum(sliceWeightSums, 1), 0)
+
+    # Remainder of each node goes to its last slice
+    allocatedPerNode = np.bincount(sliceNodes, weights=sliceAllocations, minlength=len(prbCounts)).astype(np.int64)
+    lastSlice = np.full(len(prbCounts), -1, dtype=np.int64)
+    lastSlice[sliceNodes] = np.arange(len(sliceNodes))
+    nodesWithSlices = lastSlice >= 0
+    sliceAllocations[lastSlice[nodesWithSlices]] += (prbCounts - allocatedPerNode)[nodesWithSlices]
+
+    safeUeCounts = np.maximum(sliceUeCounts, 1)
+    prbPerUe = np.repeat(sliceAllocations // safeUeCounts, sliceUeCounts)
+    remainder = np.repeat(sliceAllocations % safeUeCounts, sliceUeCounts)
+    sliceStarts = np.repeat(np.cumsum(sliceUeCounts) - sliceUeCounts, sliceUeCounts)
+    ueIndexInSlice = np.arange(len(prbPerUe)) - sliceStarts
+    ueAllocations = prbPerUe + (ueIndexInSlice < remainder)
+    return sliceAllocations, ueAllocations
+
+
+def allocate(prbCounts, sliceNodes, sliceWeights, sliceUeCounts):
+    """Compute the PRB allocation of every slice and UE of all E2 nodes in one call.
+
+    prbCounts holds the PRB count of each E2 node. For each slice, sliceNodes holds the index of its E2 node,
+    sliceWeights its share weight and sliceUeCounts its number of UEs. Returns (slice allocations, UE
+    allocations), the latter flattened in slice order. Uses NumPy when available and the population is large.
+    """
+    if sum(sliceUeCounts) >= NUMPY_MIN_UES and load_numpy(blocking=False):
+        return allocate_numpy(prbCounts, sliceNodes, sliceWeights, sliceUeCounts)
+    return allocate_python(prbCounts, sliceNodes, sliceWeights, sliceUeCounts)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import time
+import asyncio
+from streaming_stats import StreamingStats
+
+
+class StagePipeline(object):
+    """Stages of an xApp running as asyncio tasks, joined by bounded queues.
+
+    Every stage has a queue and a handler coroutine that is called once per item. Handlers pass items on with
+    put(), which waits while the next queue is full, so a slow stage holds back only the stages that feed
+    it. Threads outside the event loop (RMR receive, subscription callbacks) use submit(), which never blocks:
+    an item that finds its queue full is dropped and counted. The time each item waited in its queue (lag) and
+    the queue depths are kept per stage and, if given, reported through instrumentation.
+    """
+
+    def __init__(self, stages, queue_size=100, instrumentation=None, drain_timeout=5.0):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.instrumentation = instrumentation
+        self.drain_timeout = drain_timeout
+        self.loop = None
+        self.queues = {}
+        self.stop_event = None
+        self.lag_stats = {stage: StreamingStats() for stage in self.stages}
+        self.max_depths = {stage: 0 for stage in self.stages}
+        self.dropped = {stage: 0 for stage in self.stages}
+        if instrumentation is not None:
+            for stage in self.stages:
+                instrumentation.register_gauge(f"{stage}_queue_depth", lambda stage=stage: self.depth(stage))
+
+    def run(self, handlers, sources=()):
+        """Run the stage handlers ({stage: coroutine function(item)}) and the source coroutine functions until
+        stop() is called; blocks the calling thread."""
+        asyncio.run(self._run(handlers, sources))
+
+    async def _run(self, handlers, sources):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        self.queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in self.stages}
+        consumers = [asyncio.create_task(self._consume(stage, handlers[stage]), name=f"{stage}-stage")
+                     for stage in self.stages]
+        source_tasks = [asyncio.create_task(source()) for source in sources]
+
+        await self.stop_event.wait()
+        for task in source_tasks:
+            task.cancel()
+        await asyncio.gather(*source_tasks, return_exceptions=True)
+        # Let the items already queued pass through the remaining stages, in pipeline order
+        for stage in self.stages:
+            try:
+                await asyncio.wait_for(self.queues[stage].join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"Pipeline stage {stage} not drained within {self.drain_timeout} s, "
+                      f"{self.depth(stage)} items discarded")
+        for task in consumers:
+            task.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        self.loop = None
+
+    async def _consume(self, stage, handler):
+        queue = self.queues[stage]
+        while True:
+            enqueue_time, item = await queue.get()
+            lag = time.monotonic() - enqueue_time
+            self.lag_stats[stage].add(lag)
+            if self.instrumentation is not None:
+                self.instrumentation.record_duration(f"{stage}_queue_lag", lag * 1e9)
+            try:
+                await handler(item)
+            except Exception as e:
+                print(f"Pipeline stage {stage} failed: {e}")
+            finally:
+                queue.task_done()
+
+    def stop(self):
+        """Stop the sources, drain the queues and return from run(); callable from any thread."""
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.stop_event.set)
+
+    async def put(self, stage, item):
+        """Hand an item to a stage from inside the event loop, waiting while its queue is full."""
+        queue = self.queues[stage]
+        await queue.put((time.monotonic(), item))
+        self.max_depths[stage] = max(self.max_depths[stage], queue.qsize())
+
+    def submit(self, stage, item):
+        """Hand an item to a stage from another thread without blocking; returns False if it is dropped."""
+        loop = self.loop
+        if loop is None:
+            self.dropped[stage] += 1
+            return False
+        loop.call_soon_threadsafe(self._put_nowait, stage, (time.monotonic(), item))
+        return True
+
+    def _put_nowait(self, stage, entry):
+        queue = self.queues[stage]
+        try:
+            queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped[stage] += 1
+            return
+        self.max_depths[stage] = max(self.max_depths[stage], queue.qsize())
+
+    def depth(self, stage):
+        queue = self.queues.get(stage)
+        return queue.qsize() if queue is not None else 0
+
+    def snapshot(self):
+        """Queue depth, maximum depth, dropped items and lag (ms) per stage."""
+        return {stage: {"depth": self.depth(stage), "max_depth": self.max_depths[stage],
+                        "dropped": self.dropped[stage], "lag": self.lag_stats[stage].summary(scale=1000)}
+                for stage in self.stages}
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import argparse
+import allocation_engine
+
+
+def generate_topology(ueCount, sliceCount, nodeCount, rng):
+    """Spread ueCount UEs randomly over nodeCount E2 nodes with sliceCount slices each."""
+    sliceNodes = [node for node in range(nodeCount) for _ in range(sliceCount)]
+    sliceUeCounts = [0] * len(sliceNodes)
+    for _ in range(ueCount):
+        sliceUeCounts[rng.randrange(len(sliceNodes))] += 1
+    prbCounts = [rng.choice([51, 106, 273]) for _ in range(nodeCount)]
+    return prbCounts, sliceNodes, sliceUeCounts
+
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the PRB allocation engine')
+    parser.add_argument("--ue_counts", type=str, default='10,100,1000,10000,100000',
+                        help="UE counts as comma-separated string")
+    parser.add_argument("--slices", type=int, default=24, help="Slices per E2 node")
+    parser.add_argument("--nodes", type=int, default=8, help="E2 nodes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, best is reported")
+    args = parser.parse_args()
+
+    if not allocation_engine.load_numpy():
+        print("NumPy not available, only the Python implementation is measured")
+    rng = random.Random(1)
+    print(f"{args.nodes} E2 nodes x {args.slices} slices")
+    print("{:>8} {:>12} {:>12} {:>8}".format("UEs", "Python [ms]", "NumPy [ms]", "speed-up"))
+    for ueCount in map(int, args.ue_counts.split(",")):
+        prbCounts, sliceNodes, sliceUeCounts = generate_topology(ueCount, args.slices, args.nodes, rng)
+        # Weights of xApp #1: proportional to the UE count of each slice
+        allocation_args = (prbCounts, sliceNodes, sliceUeCounts, sliceUeCounts)
+        python_time, python_result = best_of(args.repeat, allocation_engine.allocate_python, *allocation_args)
+        if not allocation_engine.load_numpy():
+            print("{:>8} {:>12.3f} {:>12} {:>8}".format(ueCount, python_time * 1000, "-", "-"))
+            continue
+        numpy_time, numpy_result = best_of(args.repeat, allocation_engine.allocate_numpy, *allocation_args)
+        if (python_result[0] != numpy_result[0].tolist() or python_result[1] != numpy_result[1].tolist()):
+            raise SystemExit(f"Python and NumPy allocations differ for {ueCount} UEs")
+        print("{:>8} {:>12.3f} {:>12.3f} {:>7.1f}x".format(ueCount, python_time * 1000, numpy_time * 1000,
+                                                           python_time / numpy_time))
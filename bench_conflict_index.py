@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import random
+from conflict_index import ConflictIndex, decision_key
+
+
+def pairwise_conflicts(recent_decisions_xapp1, recent_decisions_xapp2):
+    """Reference O(n*m) check, as previously done in xApp_CMF.detect_and_handle_conflicts.
+
+    Conflicting pairs are collapsed to distinct (key, value #1, value #2) triples to keep memory bounded.
+    """
+    conflicts = set()
+    for dec1 in recent_decisions_xapp1:
+        for dec2 in recent_decisions_xapp2:
+            if (dec1["Control_Target_Type"] == dec2["Control_Target_Type"] and
+                    dec1["Control_Target_ID"] == dec2["Control_Target_ID"] and
+                    dec1["Parameter_Name"] == dec2["Parameter_Name"] and
+                    dec1["Parameter_Value"] != dec2["Parameter_Value"]):
+                conflicts.add((decision_key(dec1), dec1["Parameter_Value"], dec2["Parameter_Value"]))
+    return conflicts
+
+
+def generate_decisions(count, target_count, values, rng):
+    now = time.time()
+    return [{
+        "Time": now,
+        "Datetime": "",
+        "Control_Target_Type": "USER",
+        "Control_Target_ID": str(rng.randrange(target_count)),
+        "Parameter_Name": "PRB_ALLOCATION",
+        "Parameter_Value": float(rng.choice(values)),
+    } for _ in range(count)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pairwise vs hash-indexed conflict detection')
+    parser.add_argument("--decisions", type=int, default=10000, help="Decisions per xApp")
+    parser.add_argument("--targets", type=int, default=1000, help="Number of distinct UEs targeted")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--skip_pairwise", action="store_true", help="Only time the hash index")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # xApp #2 picks from a superset of xApp #1's values, so some targets agree and some conflict
+    decisions_xapp1 = generate_decisions(args.decisions, args.targets, [17, 25], rng)
+    decisions_xapp2 = generate_decisions(args.decisions, args.targets, [17, 25, 34], rng)
+    print(f"{args.decisions} decisions per xApp over {args.targets} targets")
+
+    start = time.perf_counter()
+    conflict_index = ConflictIndex()
+    conflict_index.add_all(1, decisions_xapp1)
+    conflict_index.add_all(2, decisions_xapp2)
+    indexed = conflict_index.conflicts()
+    indexed_time = time.perf_counter() - start
+    print(f"Hash index: {indexed_time * 1000:.1f} ms, {len(indexed)} conflicting keys")
+
+    if not args.skip_pairwise:
+        start = time.perf_counter()
+        pairwise = pairwise_conflicts(decisions_xapp1, decisions_xapp2)
+        pairwise_time = time.perf_counter() - start
+        pairwise_keys = set(key for key, value1, value2 in pairwise)
+        print(f"Pairwise:   {pairwise_time * 1000:.1f} ms, {len(pairwise_keys)} conflicting keys")
+        print(f"Speed-up: {pairwise_time / indexed_time:.0f}x")
+
+        expected = set((key, value1, value2) for key, values_by_xapp in indexed.items()
+                       for value1 in values_by_xapp[1] for value2 in values_by_xapp[2] if value1 != value2)
+        if pairwise != expected:
+            raise SystemExit("Mismatch between pairwise and indexed conflict detection")
+        print("Pairwise and indexed detection agree")
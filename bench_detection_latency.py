@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+from conflict_index import ConflictIndex
+from decision_tail import DecisionTailReader, DecisionWindow
+from file_watcher import DecisionWatcher
+
+DECISION_HEADER = "Time,Datetime,Control_Target_Type,Control_Target_ID,Parameter_Name,Parameter_Value\n"
+
+
+def detection_loop(decision_file_paths, block_file_path, watcher, stop):
+    """Same read/detect/block cycle as xApp_CMF.MyXapp.start, without the RIC plumbing.
+
+    Every trial injects a conflict on a new target, so the block file is (re)created for newly seen conflicts.
+    """
+    readers = [(DecisionTailReader(path), DecisionWindow(10)) for path in decision_file_paths]
+    seen_conflicts = set()
+    while not stop.is_set():
+        conflict_index = ConflictIndex()
+        for xapp_id, (reader, window) in enumerate(readers, start=1):
+            window.extend(reader.read_new_decisions())
+            conflict_index.add_all(xapp_id, window.recent(time.time()))
+        conflicts = set(conflict_index.conflicts())
+        if conflicts - seen_conflicts:
+            open(block_file_path, "w").close()
+            seen_conflicts |= conflicts
+        if watcher is not None:
+            watcher.wait(1)
+        else:
+            time.sleep(1)
+
+
+def write_decision(file_path, target_id, value):
+    with open(file_path, "a") as f:
+        f.write(f"{time.time()},,USER,{target_id},PRB_ALLOCATION,{value}\n")
+
+
+def measure(directory, event_driven, trials):
+    decision_file_paths = [os.path.join(directory, f"xapp_decisions_{i}.csv") for i in (1, 2)]
+    block_file_path = os.path.join(directory, "xapp_2.block")
+    for path in decision_file_paths:
+        with open(path, "w") as f:
+            f.write(DECISION_HEADER)
+
+    watcher = DecisionWatcher(decision_file_paths) if event_driven else None
+    stop = threading.Event()
+    thread = threading.Thread(target=detection_loop, args=(decision_file_paths, block_file_path, watcher, stop))
+    thread.start()
+
+    latencies = []
+    for trial in range(trials):
+        # Unaligned with the polling interval, as a real xApp decision would be
+        time.sleep(0.1 + (trial * 0.37) % 1)
+        write_decision(decision_file_paths[0], trial, 17)
+        write_start = time.time()
+        write_decision(decision_file_paths[1], trial, 25)
+        while not os.path.exists(block_file_path):
+            time.sleep(0.0005)
+        latencies.append(time.time() - write_start)
+        os.remove(block_file_path)
+
+    stop.set()
+    if watcher is not None:
+        watcher.notify()
+    thread.join()
+    if watcher is not None:
+        watcher.close()
+    return sorted(latencies)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure CMF detection latency from decision write to block file')
+    parser.add_argument("--trials", type=int, default=10, help="Conflicts to inject per mode")
+    args = parser.parse_args()
+
+    for event_driven in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            latencies = measure(directory, event_driven, args.trials)
+        print("{:<13} median {:7.1f} ms, max {:7.1f} ms".format(
+            "event-driven:" if event_driven else "polling:",
+            latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000))
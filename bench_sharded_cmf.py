@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import random
+from conflict_index import ConflictIndex
+from conflict_resolution import ConflictResolver
+from sharded_detection import ShardedConflictDetector
+from streaming_stats import StreamingStats
+from compact_records import decision_record
+
+
+def generate_decisions(count, target_count, values, now, rng):
+    decisions = []
+    for _ in range(count):
+        target = rng.randrange(target_count)
+        decisions.append(decision_record({
+            "Time": now - rng.random(),
+            "Datetime": "",
+            "Control_Target_Type": "USER",
+            "Control_Target_ID": f"gnbd_{target % 64}/{target}",
+            "Parameter_Name": "PRB_ALLOCATION",
+            "Parameter_Value": float(rng.choice(values)),
+        }))
+    return decisions
+
+
+def bench_in_process(decisions_by_xapp, cycles, now):
+    """Detection cycle in the CMF process, as without --detection_workers."""
+    resolver = ConflictResolver()
+    stats = StreamingStats()
+    conflict_count = 0
+    for _ in range(cycles):
+        start = time.perf_counter()
+        conflict_index = ConflictIndex()
+        for xapp_id, decisions in decisions_by_xapp.items():
+            conflict_index.add_records(xapp_id, decisions)
+        conflict_count = len(resolver.resolve(conflict_index, now)[0])
+        stats.add(time.perf_counter() - start)
+    return 0.0, stats, conflict_count
+
+
+def bench_sharded(decisions_by_xapp, cycles, now, worker_count, time_threshold):
+    detector = ShardedConflictDetector(worker_count, time_threshold)
+    detector.start()
+    try:
+        start = time.perf_counter()
+        for xapp_id, decisions in decisions_by_xapp.items():
+            detector.add(xapp_id, decisions)
+        # The first cycle returns once every worker has taken in its decisions
+        detector.resolve(now)
+        ingest_time = time.perf_counter() - start
+
+        stats = StreamingStats()
+        conflict_count = 0
+        for _ in range(cycles):
+            start = time.perf_counter()
+            conflict_count = len(detector.resolve(now)[0])
+            stats.add(time.perf_counter() - start)
+    finally:
+        detector.stop()
+    return ingest_time, stats, conflict_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sharded CMF conflict detection by worker count')
+    parser.add_argument("--decisions", type=int, default=50000, help="Decisions per xApp in the window")
+    parser.add_argument("--targets", type=int, default=20000, help="Number of distinct UEs targeted")
+    parser.add_argument("--xapps", type=int, default=3, help="Number of xApps")
+    parser.add_argument("--workers", type=str, default='1,2,4,8', help="Comma-separated worker counts")
+    parser.add_argument("--cycles", type=int, default=5, help="Detection cycles per worker count")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = time.time()
+    decisions_by_xapp = {xapp_id: generate_decisions(args.decisions, args.targets, [17, 25, 34], now, rng)
+                         for xapp_id in range(1, args.xapps + 1)}
+    total_decisions = args.decisions * args.xapps
+    print(f"{total_decisions} decisions of {args.xapps} xApps over {args.targets} targets, {args.cycles} cycles")
+
+    runs = [("in-process", lambda: bench_in_process(decisions_by_xapp, args.cycles, now))]
+    for worker_count in map(int, args.workers.split(",")):
+        runs.append((f"{worker_count} workers",
+                     lambda worker_count=worker_count: bench_sharded(decisions_by_xapp, args.cycles, now,
+                                                                     worker_count, 3600)))
+
+    print(f"{'mode':<12} {'ingest ms':>10} {'cycle p50 ms':>13} {'cycle max ms':>13} {'decisions/s':>12} "
+          f"{'conflicts':>10}")
+    for name, run in runs:
+        ingest_time, stats, conflict_count = run()
+        cycle_time = stats.quantile(0.5)
+        print(f"{name:<12} {ingest_time * 1000:10.1f} {cycle_time * 1000:13.1f} {stats.max * 1000:13.1f} "
+              f"{total_decisions / cycle_time:12.0f} {conflict_count:10d}")
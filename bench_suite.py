@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+import e2_standin
+
+# The xApps are imported against the stand-in RIC framework
+e2_standin.install()
+import xapp_timing_1
+import xApp_CMF
+from streaming_stats import StreamingStats
+
+BENCH_E2_NODE_ID = 'gnbd_bench_0'
+
+# Whether a larger value of a metric is better, for comparison against a baseline
+HIGHER_IS_BETTER = {
+    'indications_per_s': True,
+}
+
+
+@contextlib.contextmanager
+def working_directory():
+    """Run in a fresh temporary directory; the xApps keep their logs, decisions and block files in the cwd."""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(previous)
+
+
+def create_xapp(app_mode, **kwargs):
+    return xapp_timing_1.MyXapp('', 0, 0, e2_standin.StandInCentralController(), f'bench_xapp_{app_mode}', '',
+                                app_mode, quiet_metrics=True, **kwargs)
+
+
+def stop_xapp(xapp):
+    xapp.measurement_logger.stop()
+    xapp.control_fanout.shutdown()
+    if xapp.bus is not None:
+        xapp.bus.close()
+
+
+def bench_indication_throughput(ue_count, indication_count):
+    """Indications per second through the KPM subscription callback (decode, log queue, UE count)."""
+    e2_standin.ran.reset()
+    with working_directory():
+        xapp = create_xapp(1)
+        xapp.setup_subscription(BENCH_E2_NODE_ID)
+        node = e2_standin.ran.node(BENCH_E2_NODE_ID)
+        indications = [e2_standin.encode_indication(*indication)
+                       for indication in e2_standin.synthetic_indications(ue_count, indication_count)]
+
+        stats = StreamingStats()
+        start = time.perf_counter()
+        for indication_hdr, indication_msg in indications:
+            indication_start = time.perf_counter()
+            node.deliver_indication(indication_hdr, indication_msg)
+            stats.add(time.perf_counter() - indication_start)
+        elapsed = time.perf_counter() - start
+        stop_xapp(xapp)
+    return {
+        'indications_per_s': indication_count / elapsed,
+        'indication_p50_ms': stats.quantile(0.5) * 1000,
+        'indication_p99_ms': stats.quantile(0.99) * 1000,
+        'dropped_indications': xapp.measurement_logger.dropped_indications,
+    }
+
+
+def bench_control_round(node_count, slice_count, ues_per_slice, rounds, control_delay):
+    """Latency of a full control round (allocation and all RIC control requests) over a topology."""
+    e2_standin.ran.reset(control_delay)
+    topology = [{
+        'e2_node_id': f'gnbd_bench_{node}',
+        'slices': [{'name': str(slice_index), 'sst': 1, 'sd': 16777200 + slice_index,
+                    'ues': list(range(slice_index * ues_per_slice, (slice_index + 1) * ues_per_slice))}
+                   for slice_index in range(slice_count)],
+    } for node in range(node_count)]
+
+    with working_directory():
+        # Refresh interval 0: every round sends every quota
+        xapp = create_xapp(1, topology=topology, quota_refresh_interval=0)
+        for node in topology:
+            xapp.updateLatestUeCount(slice_count * ues_per_slice, node['e2_node_id'])
+        stats = StreamingStats()
+        for _ in range(rounds):
+            start = time.perf_counter()
+            xapp.process(xapp.activeTopology(topology), 51)
+            stats.add(time.perf_counter() - start)
+        stop_xapp(xapp)
+
+    sent = sum(len(node.control_requests) for node in e2_standin.ran.nodes.values())
+    expected = rounds * node_count * slice_count * ues_per_slice
+    if sent != expected:
+        raise RuntimeError(f"Stand-in E2 nodes received {sent} control requests, expected {expected}")
+    return {
+        'control_round_p50_ms': stats.quantile(0.5) * 1000,
+        'control_round_max_ms': stats.max * 1000,
+        'control_requests_per_round': expected // rounds,
+    }
+
+
+def measure_cmf_detection(mode, offset):
+    """Time from xApp #2 logging a conflicting decision to it being blocked by the CMF, in seconds."""
+    with working_directory() as directory:
+        bus_path = os.path.join(directory, 'decision_bus.sock') if mode == 'bus' else ''
+        cmf = xApp_CMF.MyXapp('', 0, 0)
+        cmf_thread = threading.Thread(target=cmf.start, args=(mode == 'event_driven', bus_path))
+        cmf_thread.start()
+        xapp1 = create_xapp(1, bus_path=bus_path or None)
+        xapp2 = create_xapp(2, bus_path=bus_path or None)
+
+        xapp1.log_control_decision(time.time(), xApp_CMF.datetime.datetime.now(), "USER", "bench/0",
+                                   "PRB_ALLOCATION", 34)
+        # Unaligned with the CMF polling interval, as a real decision would be
+        time.sleep(offset)
+        start = time.perf_counter()
+        xapp2.log_control_decision(time.time(), xApp_CMF.datetime.datetime.now(), "USER", "bench/0",
+                                   "PRB_ALLOCATION", 25)
+        while not xapp2.is_blocked():
+            time.sleep(0.0002)
+        latency = time.perf_counter() - start
+
+        cmf.stop()
+        if cmf.watcher is not None:
+            cmf.watcher.notify()
+        cmf_thread.join()
+        stop_xapp(xapp1)
+        stop_xapp(xapp2)
+    return latency
+
+
+def bench_cmf_detection(trials):
+    results = {}
+    for mode in ('polling', 'event_driven', 'bus'):
+        stats = StreamingStats()
+        for trial in range(trials):
+            stats.add(measure_cmf_detection(mode, 0.05 + (trial * 0.37) % 1))
+        results[f'cmf_detection_{mode}_p50_ms'] = stats.quantile(0.5) * 1000
+        results[f'cmf_detection_{mode}_max_ms'] = stats.max * 1000
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the metrics that are worse than the baseline by more than tolerance (a fraction)."""
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline or name.endswith('_count') or name == 'control_requests_per_round':
+            continue
+        reference = baseline[name]
+        if HIGHER_IS_BETTER.get(name, False):
+            regressed = value < reference * (1 - tolerance)
+        else:
+            regressed = value > reference * (1 + tolerance) and name != 'dropped_indications'
+        if regressed:
+            regressions.append((name, reference, value))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmark suite for the xApps and the CMF')
+    parser.add_argument("--ue_count", type=int, default=100, help="UEs per KPM indication")
+    parser.add_argument("--indications", type=int, default=2000, help="Indications to replay")
+    parser.add_argument("--nodes", type=int, default=4, help="E2 nodes in the control round benchmark")
+    parser.add_argument("--slices", type=int, default=4, help="Slices per E2 node")
+    parser.add_argument("--ues_per_slice", type=int, default=25, help="UEs per slice")
+    parser.add_argument("--rounds", type=int, default=20, help="Control rounds")
+    parser.add_argument("--control_delay", type=float, default=0.0005,
+                        help="Simulated time per RIC control request in seconds")
+    parser.add_argument("--cmf_trials", type=int, default=5, help="Conflicts injected per CMF mode")
+    parser.add_argument("--output", type=str, default='', help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default='', help="Compare against results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    # The xApps print every round and decision; keep the console for the results
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results.update(bench_indication_throughput(args.ue_count, args.indications))
+        results.update(bench_control_round(args.nodes, args.slices, args.ues_per_slice, args.rounds,
+                                           args.control_delay))
+        results.update(bench_cmf_detection(args.cmf_trials))
+
+    for name, value in results.items():
+        print(f"{name:<32} {value:12.3f}")
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        for name, reference, value in regressions:
+            print(f"REGRESSION {name}: {reference:.3f} -> {value:.3f}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import sys
+import operator
+import threading
+from array import array
+
+
+class Interner(object):
+    """Two-way mapping between strings and small integer codes, assigned in order of first use.
+
+    Safe to use from several threads: known values are looked up without locking, and new codes are assigned
+    under a lock and published only once their value can be decoded.
+    """
+
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        self.lock = threading.Lock()
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def value(self, code):
+        return self.values[code]
+
+
+# Process-wide codes; the well-known names get the same codes in every process
+target_types = Interner(["USER"])
+parameter_names = Interner(["PRB_ALLOCATION"])
+metric_names = Interner(["DRB.UEThpDl"])
+
+
+class DecisionRecord(object):
+    """One control decision in the CMF window, with target type and parameter name as interned codes.
+
+    Replaces the six-key dicts built per CSV row or bus message: no Datetime string, no per-record dict, and
+    target IDs are interned strings shared by all decisions for the same UE.
+    """
+
+    __slots__ = ("time", "target_type", "target_id", "parameter", "value")
+
+    def __init__(self, time, target_type, target_id, parameter, value):
+        self.time = time
+        self.target_type = target_type
+        self.target_id = target_id
+        self.parameter = parameter
+        self.value = value
+
+    @property
+    def key(self):
+        return self.target_type, self.target_id, self.parameter
+
+
+RECORD_TIME = operator.attrgetter("time")
+
+
+def decision_record(decision):
+    """Convert a decision dict (CSV row or bus message) into a DecisionRecord."""
+    return DecisionRecord(float(decision["Time"]), target_types.code(decision["Control_Target_Type"]),
+                          sys.intern(str(decision["Control_Target_ID"])),
+                          parameter_names.code(decision["Parameter_Name"]), float(decision["Parameter_Value"]))
+
+
+def decode_key(key):
+    """Return the (Control_Target_Type, Control_Target_ID, Parameter_Name) strings of a record key."""
+    target_type, target_id, parameter = key
+    return target_types.value(target_type), target_id, parameter_names.value(parameter)
+
+
+class MeasurementBatch(object):
+    """Samples of one KPM indication as parallel arrays of UE IDs, metric codes and values.
+
+    Built by the subscription callback and written by the measurement logger without a tuple or list per
+    sample; iterating yields (UE_id, metric name, value) like the plain sample lists.
+    """
+
+    __slots__ = ("ue_ids", "metric_codes", "values")
+
+    def __init__(self):
+        self.ue_ids = array("q")
+        self.metric_codes = array("H")
+        self.values = array("d")
+
+    def append(self, ue_id, metric_code, value):
+        self.ue_ids.append(ue_id)
+        self.metric_codes.append(metric_code)
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        names = metric_names.values
+        for ue_id, code, value in zip(self.ue_ids, self.metric_codes, self.values):
+            yield ue_id, names[code], value
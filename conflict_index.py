@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import collections
+
+
+def decision_key(decision):
+    """Return the key under which two control decisions can conflict."""
+    return (decision["Control_Target_Type"], decision["Control_Target_ID"], decision["Parameter_Name"])
+
+
+def in_conflict(values_by_xapp):
+    """Return True if at least two xApps issued decisions for a key and not all of them carry the same value."""
+    if len(values_by_xapp) < 2:
+        return False
+    distinct_values = set()
+    for values in values_by_xapp.values():
+        distinct_values |= values
+        if len(distinct_values) > 1:
+            return True
+    return False
+
+
+class ConflictIndex(object):
+    """Hash index of recent control decisions for conflict detection across any number of xApps.
+
+    Decisions are grouped by (Control_Target_Type, Control_Target_ID, Parameter_Name), so detection costs one
+    insert per decision plus one pass over the keys instead of comparing every decision pair. A key is in
+    conflict when at least two xApps issued decisions for it and those decisions do not all carry the same
+    value, which is exactly when the pairwise check finds at least one differing pair.
+    """
+
+    def __init__(self):
+        # key -> {xapp_id: set of Parameter_Value}
+        self.values = collections.defaultdict(dict)
+        # key -> {xapp_id: time of its first decision in the window}, and key -> time of the latest decision
+        self.first_times = collections.defaultdict(dict)
+        self.latest_times = {}
+
+    def add(self, xapp_id, decision):
+        key = decision_key(decision)
+        decision_time = decision["Time"]
+        self.values[key].setdefault(xapp_id, set()).add(decision["Parameter_Value"])
+        first_times = self.first_times[key]
+        if decision_time < first_times.get(xapp_id, decision_time + 1):
+            first_times[xapp_id] = decision_time
+        if decision_time > self.latest_times.get(key, decision_time - 1):
+            self.latest_times[key] = decision_time
+
+    def add_all(self, xapp_id, decisions):
+        for decision in decisions:
+            self.add(xapp_id, decision)
+
+    def add_records(self, xapp_id, records):
+        """Add a batch of compact DecisionRecords; their keys carry interned target type and parameter codes."""
+        values = self.values
+        first_times = self.first_times
+        latest_times = self.latest_times
+        for record in records:
+            key = (record.target_type, record.target_id, record.parameter)
+            decision_time = record.time
+            values_by_xapp = values[key]
+            if xapp_id in values_by_xapp:
+                values_by_xapp[xapp_id].add(record.value)
+            else:
+                values_by_xapp[xapp_id] = {record.value}
+            key_first_times = first_times[key]
+            if decision_time < key_first_times.get(xapp_id, decision_time + 1):
+                key_first_times[xapp_id] = decision_time
+            if decision_time > latest_times.get(key, decision_time - 1):
+                latest_times[key] = decision_time
+
+    def clear(self):
+        self.values.clear()
+        self.first_times.clear()
+        self.latest_times.clear()
+
+    def conflicts(self):
+        """Return {key: {xapp_id: set of values}} for every conflicting key."""
+        return {key: values_by_xapp for key, values_by_xapp in self.values.items() if in_conflict(values_by_xapp)}
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+from conflict_index import in_conflict
+from compact_records import parameter_names
+
+
+class PriorityTable(object):
+    """Priority of each xApp, optionally overridden per parameter; a higher priority wins a conflict.
+
+    xApps missing from the table get default_priority, and equal priorities are ordered by xApp ID (lower ID
+    first), so the empty table keeps xApp #1 ahead of xApp #2 as before. Parameters can be given by name or by
+    their interned code (keys of DecisionRecords).
+    """
+
+    def __init__(self, priorities=None, parameter_priorities=None, default_priority=0):
+        self.priorities = {int(xapp_id): priority for xapp_id, priority in (priorities or {}).items()}
+        self.parameter_priorities = {}
+        for parameter_name, priorities_ in (parameter_priorities or {}).items():
+            priorities_ = {int(xapp_id): priority for xapp_id, priority in priorities_.items()}
+            self.parameter_priorities[parameter_name] = priorities_
+            self.parameter_priorities[parameter_names.code(parameter_name)] = priorities_
+        self.default_priority = default_priority
+
+    @classmethod
+    def from_json(cls, file_path):
+        """Load {"priorities": {xapp_id: priority}, "parameters": {name: {xapp_id: priority}},
+        "default_priority": priority}."""
+        with open(file_path) as f:
+            table = json.load(f)
+        return cls(table.get("priorities"), table.get("parameters"), table.get("default_priority", 0))
+
+    def rank(self, xapp_id, parameter_name):
+        priorities = self.parameter_priorities.get(parameter_name, {})
+        priority = priorities.get(xapp_id, self.priorities.get(xapp_id, self.default_priority))
+        return priority, -xapp_id
+
+
+def priority_policy(key, values_by_xapp, first_times, priority_table):
+    """The xApp with the highest priority for the parameter keeps control."""
+    return max(values_by_xapp, key=lambda xapp_id: priority_table.rank(xapp_id, key[2]))
+
+
+def first_writer_policy(key, values_by_xapp, first_times, priority_table):
+    """The xApp that controlled the target first in the window keeps control; ties go to the higher priority."""
+    first_time = min(first_times[xapp_id] for xapp_id in values_by_xapp)
+    incumbents = [xapp_id for xapp_id in values_by_xapp if first_times[xapp_id] == first_time]
+    return max(incumbents, key=lambda xapp_id: priority_table.rank(xapp_id, key[2]))
+
+
+# Resolution policies by name: policy(key, {xapp_id: values}, {xapp_id: first decision time}, priority table)
+# returns the xApp that keeps control of the key; all other xApps are blocked for it
+POLICIES = {
+    "priority": priority_policy,
+    "first_writer": first_writer_policy,
+}
+
+
+def register_policy(name, policy):
+    POLICIES[name] = policy
+
+
+def default_hold_ttl(refresh_interval=10.0, window=10.0, execution_period=10.0):
+    """How long a winner holds a key after its last decision left the window: the xApps' quota refresh interval
+    plus a margin of one detection window and one execution period, so that a refresh delayed by round
+    lateness, send latency or the phase of the detection cycle still arrives while the loser is blocked."""
+    return refresh_interval + window + execution_period
+
+
+class ConflictResolver(object):
+    """Per-key conflict resolution over a ConflictIndex, with blocks that expire on their own.
+
+    For every conflicting (Control_Target_Type, Control_Target_ID, Parameter_Name) key the policy picks the xApp
+    that keeps control, and every other xApp with decisions for the key is blocked for that key only. A block
+    is renewed on every pass that still finds the conflict and is lifted block_ttl seconds after the last one,
+    but not while the winner still holds the key: xApps resend unchanged quotas only every refresh interval, so
+    the winner is taken to hold the key until hold_ttl seconds after its last decision for it left the window.
+    hold_ttl must exceed the xApps' quota refresh interval by a margin; see default_hold_ttl().
+    """
+
+    def __init__(self, policy="priority", priority_table=None, block_ttl=10.0, hold_ttl=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown conflict resolution policy {policy}, expected one of {sorted(POLICIES)}")
+        self.policy_name = policy
+        self.policy = POLICIES[policy]
+        self.priority_table = priority_table or PriorityTable()
+        self.block_ttl = block_ttl
+        self.hold_ttl = default_hold_ttl(window=block_ttl) if hold_ttl is None else hold_ttl
+        self.blocks = {}  # (xapp_id, key) -> expiry time
+        self.holders = {}  # key -> [winning xApp, last time its decisions for the key were in the window]
+
+    def resolve(self, conflict_index, now):
+        """Detect and resolve conflicts in one pass over the index.
+
+        Returns (conflicts, new_blocks, lifted_blocks): conflicts maps each conflicting key to (winning xApp,
+        {xapp_id: values}); new_blocks and lifted_blocks list the (xapp_id, key) blocks added and expired.
+        """
+        conflicts = {}
+        new_blocks = []
+        lifted_blocks = []
+        expiry = now + self.block_ttl
+        for key, values_by_xapp in conflict_index.values.items():
+            if not in_conflict(values_by_xapp):
+                continue
+            winner = self.policy(key, values_by_xapp, conflict_index.first_times[key], self.priority_table)
+            conflicts[key] = (winner, values_by_xapp)
+            self.holders[key] = [winner, now]
+            for xapp_id in values_by_xapp:
+                block = (xapp_id, key)
+                if xapp_id == winner:
+                    if self.blocks.pop(block, None) is not None:
+                        lifted_blocks.append(block)
+                    continue
+                if block not in self.blocks:
+                    new_blocks.append(block)
+                self.blocks[block] = expiry
+
+        held_until = {}
+        for key, holder in list(self.holders.items()):
+            winner, last_held = holder
+            if winner in conflict_index.values.get(key, ()):
+                holder[1] = last_held = now
+            if last_held + self.hold_ttl <= now:
+                del self.holders[key]
+            else:
+                held_until[key] = last_held + self.hold_ttl
+
+        for block, block_expiry in list(self.blocks.items()):
+            if block_expiry <= now and held_until.get(block[1], now) <= now:
+                del self.blocks[block]
+                lifted_blocks.append(block)
+        return conflicts, new_blocks, lifted_blocks
+
+    def blocked_keys(self, xapp_id):
+        return sorted(key for blocked_xapp_id, key in self.blocks if blocked_xapp_id == xapp_id)
+
+
+BLOCK_FILE_FIELDS = ["Control_Target_Type", "Control_Target_ID", "Parameter_Name"]
+
+
+def write_block_file(file_path, keys):
+    """Write the keys an xApp is blocked for; the file is replaced atomically so readers never see it partial."""
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "w", newline="") as f:
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(BLOCK_FILE_FIELDS)
+        csv_writer.writerows(keys)
+    os.replace(temporary_path, file_path)
+
+
+def read_block_file(file_path):
+    """Return the set of keys in a block file, None if there is none.
+
+    An empty set means the whole xApp is blocked (an empty block file, as created by hand or by older CMFs).
+    """
+    try:
+        with open(file_path, newline="") as f:
+            return set((row["Control_Target_Type"], row["Control_Target_ID"], row["Parameter_Name"])
+                       for row in csv.DictReader(f))
+    except FileNotFoundError:
+        return None
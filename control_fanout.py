@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import time
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ControlFanout(object):
+    """Send the RIC control requests of one round concurrently across E2 nodes.
+
+    Requests are dicts with at least an 'e2_node_id' key. The requests of each node are split into at most
+    max_in_flight_per_node lanes; each lane sends its requests one after the other on a pool thread, so no
+    node ever has more than max_in_flight_per_node requests outstanding and a slow node only delays itself.
+    """
+
+    def __init__(self, max_workers=16, max_in_flight_per_node=4):
+        self.max_in_flight_per_node = max_in_flight_per_node
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="control-fanout")
+
+    def _send_lane(self, lane, send, round_start):
+        results = []
+        for request in lane:
+            try:
+                results.append((request, send(request), None))
+            except Exception as e:
+                results.append((request, None, e))
+        return results, time.monotonic() - round_start
+
+    def run_round(self, requests, send):
+        """Call send(request) for every request and wait for all of them.
+
+        Returns {e2_node_id: {'acks': [(request, ack)], 'errors': [(request, exception)], 'round_time': s}},
+        where round_time is the time from the start of the round until the last request of that node returned.
+        """
+        requests_by_node = collections.defaultdict(list)
+        for request in requests:
+            requests_by_node[request['e2_node_id']].append(request)
+
+        round_start = time.monotonic()
+        futures = []
+        for e2_node_id, node_requests in requests_by_node.items():
+            lane_count = min(self.max_in_flight_per_node, len(node_requests))
+            for lane_index in range(lane_count):
+                lane = node_requests[lane_index::lane_count]
+                futures.append((e2_node_id, self.executor.submit(self._send_lane, lane, send, round_start)))
+
+        results = {e2_node_id: {'acks': [], 'errors': [], 'round_time': 0.0} for e2_node_id in requests_by_node}
+        for e2_node_id, future in futures:
+            lane_results, lane_time = future.result()
+            node_results = results[e2_node_id]
+            for request, ack, error in lane_results:
+                if error is None:
+                    node_results['acks'].append((request, ack))
+                else:
+                    node_results['errors'].append((request, error))
+            node_results['round_time'] = max(node_results['round_time'], lane_time)
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+
+# Messages are newline-delimited JSON objects with a "topic" key:
+#   {"topic": "subscribe", "topics": ["verdict"]}            sent by a client to choose what it receives
+#   {"topic": "decision", "xapp_id": 1, "Time": ..., ...}    control decision published by an xApp
+#   {"topic": "verdict", "xapp_id": 2, "blocked": true}      CMF verdict for one xApp
+# A message with "retain": true is kept per (topic, xapp_id) and replayed to clients subscribing later, so an
+# xApp that (re)starts after a verdict was published still receives it.
+
+
+def encode_message(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+class DecisionBusServer(object):
+    """Publish/subscribe hub for control decisions and CMF verdicts over a Unix-domain socket.
+
+    In-process subscribers (e.g. the CMF hosting the bus) register a callback with subscribe() and publish
+    with publish() without going through the socket.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.lock = threading.Lock()
+        self.connections = {}  # connection -> (subscribed topics, send lock)
+        self.local_subscribers = []  # (topics, callback)
+        self.retained = {}
+        self.server_socket = None
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket left by a previous run
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server_socket.bind(self.socket_path)
+        self.server_socket.listen()
+        threading.Thread(target=self._accept_connections, name="decision-bus", daemon=True).start()
+        print(f"Decision bus listening on {self.socket_path}")
+
+    def stop(self):
+        if self.server_socket is not None:
+            self.server_socket.close()
+            self.server_socket = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        with self.lock:
+            connections = list(self.connections)
+            self.connections.clear()
+        for connection in connections:
+            try:
+                # Ends the connection for the client too, which close() does not while its reader holds it open
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+    def _accept_connections(self):
+        while self.server_socket is not None:
+            try:
+                connection, _ = self.server_socket.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections[connection] = (set(), threading.Lock())
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection):
+        try:
+            for line in connection.makefile("rb"):
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    print(f"Decision bus: dropping malformed message: {e}")
+                    continue
+                if message.get("topic") == "subscribe":
+                    self._subscribe_connection(connection, message.get("topics", []))
+                else:
+                    self.publish(message, sender=connection)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.connections.pop(connection, None)
+            connection.close()
+
+    def _subscribe_connection(self, connection, topics):
+        with self.lock:
+            if connection not in self.connections:
+                return
+            subscribed_topics, send_lock = self.connections[connection]
+            subscribed_topics.update(topics)
+            retained = [data for (topic, xapp_id), (message, data) in self.retained.items() if topic in topics]
+        for data in retained:
+            self._send(connection, send_lock, data)
+
+    def _send(self, connection, send_lock, data):
+        try:
+            with send_lock:
+                connection.sendall(data)
+        except OSError:
+            with self.lock:
+                self.connections.pop(connection, None)
+
+    def subscribe(self, topics, callback):
+        """Register an in-process subscriber; retained messages are delivered immediately."""
+        with self.lock:
+            self.local_subscribers.append((set(topics), callback))
+            retained = [message for (topic, xapp_id), (message, data) in self.retained.items() if topic in topics]
+        for message in retained:
+            callback(message)
+
+    def publish(self, message, sender=None):
+        topic = message.get("topic")
+        data = encode_message(message)
+        with self.lock:
+            if message.get("retain"):
+                self.retained[(topic, message.get("xapp_id"))] = (message, data)
+            targets = [(connection, send_lock) for connection, (topics, send_lock) in self.connections.items()
+                       if topic in topics and connection is not sender]
+            callbacks = [callback for topics, callback in self.local_subscribers if topic in topics]
+        for connection, send_lock in targets:
+            self._send(connection, send_lock, data)
+        for callback in callbacks:
+            callback(message)
+
+
+class DecisionBusClient(object):
+    """Connection of an xApp to the decision bus; received messages are pushed to callback from a thread.
+
+    A lost connection is re-established with exponential backoff (up to max_backoff seconds) and the topics are
+    subscribed again, which replays the retained verdicts. on_disconnect is called when the connection is lost,
+    so that the xApp can stop trusting its last verdict until a fresh one arrives.
+    """
+
+    def __init__(self, socket_path, topics=(), callback=None, connect_timeout=10, on_disconnect=None,
+                 max_backoff=5.0):
+        self.socket_path = socket_path
+        self.topics = list(topics)
+        self.callback = callback
+        self.on_disconnect = on_disconnect
+        self.max_backoff = max_backoff
+        self.closed = False
+        self.send_lock = threading.Lock()
+        self.connection = self._connect(connect_timeout)
+        self._subscribe()
+        threading.Thread(target=self._receive_messages, name="decision-bus-client", daemon=True).start()
+
+    def _subscribe(self):
+        if self.topics:
+            self.publish({"topic": "subscribe", "topics": self.topics})
+
+    def _connect(self, connect_timeout):
+        # The bus may come up after the xApp, e.g. when the CMF is started second
+        deadline = time.time() + connect_timeout
+        while True:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.connect(self.socket_path)
+                return connection
+            except OSError:
+                connection.close()
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _receive_messages(self):
+        while not self.closed:
+            try:
+                for line in self.connection.makefile("rb"):
+                    if self.callback is not None:
+                        self.callback(json.loads(line))
+                reason = "closed by the bus"
+            except (OSError, ValueError) as e:
+                reason = e
+            if self.closed:
+                return
+            print(f"Decision bus connection lost ({reason}), reconnecting")
+            if self.on_disconnect is not None:
+                self.on_disconnect()
+            self._reconnect()
+
+    def _reconnect(self):
+        backoff = 0.1
+        while not self.closed:
+            try:
+                connection = self._connect(0)
+            except OSError:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            with self.send_lock:
+                self.connection.close()
+                self.connection = connection
+            self._subscribe()
+            print(f"Decision bus reconnected to {self.socket_path}")
+            return
+
+    def publish(self, message):
+        try:
+            with self.send_lock:
+                self.connection.sendall(encode_message(message))
+        except OSError as e:
+            print(f"Decision bus: failed to publish {message.get('topic')} message: {e}")
+
+    def close(self):
+        self.closed = True
+        try:
+            # Wakes the receiving thread, which a plain close() does not
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Standalone decision bus for xApps and the CMF')
+    parser.add_argument("--bus_path", type=str, default='/tmp/decision_bus.sock', help="Unix-domain socket path")
+    args = parser.parse_args()
+
+    server = DecisionBusServer(args.bus_path)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
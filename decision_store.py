@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+from compact_records import DecisionRecord, target_types, parameter_names
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    xapp_id INTEGER NOT NULL,
+    target_type TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    parameter TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decisions_time ON decisions (time);
+CREATE INDEX IF NOT EXISTS decisions_xapp_time ON decisions (xapp_id, time);
+CREATE INDEX IF NOT EXISTS decisions_target ON decisions (target_type, target_id, parameter, xapp_id, time);
+CREATE TABLE IF NOT EXISTS measurements (
+    time REAL NOT NULL,
+    collet_start_time TEXT,
+    ue_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS measurements_time ON measurements (time);
+CREATE INDEX IF NOT EXISTS measurements_ue_time ON measurements (ue_id, time);
+"""
+
+
+WAL_SIZE_LIMIT = 4 * 1024 * 1024
+
+
+def vacuum(connection):
+    """Return the free pages to the file system; executescript steps the pragma until all of them are freed."""
+    connection.executescript("PRAGMA incremental_vacuum;")
+
+
+def connect(file_path, read_only=False):
+    """Open a store database shared by several processes (xApps write, the CMF reads).
+
+    A read-only connection fails on a missing file instead of creating an empty database.
+    """
+    if read_only:
+        return sqlite3.connect(f"file:{file_path}?mode=ro", uri=True, timeout=10, check_same_thread=False,
+                               isolation_level=None)
+    connection = sqlite3.connect(file_path, timeout=10, check_same_thread=False, isolation_level=None)
+    # Must be set before the first table is created to take effect
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Readers do not block the writers and vice versa
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    # Truncate the -wal file back to this size after checkpoints instead of keeping its largest size
+    connection.execute(f"PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def to_records(rows):
+    """Convert (time, target type, target ID, parameter, value) rows into DecisionRecords."""
+    target_type_code = target_types.code
+    parameter_code = parameter_names.code
+    intern = sys.intern
+    return [DecisionRecord(decision_time, target_type_code(target_type), intern(target_id),
+                           parameter_code(parameter), value)
+            for decision_time, target_type, target_id, parameter, value in rows]
+
+
+class DecisionStore(object):
+    """Control decisions in an embedded SQLite database, indexed by time and by (target, parameter, xApp).
+
+    Decisions are buffered and inserted in one transaction per batch of batch_size, or when flush() is called
+    (at the end of every control round). Rows older than retention seconds are deleted at most every
+    retention_interval seconds and the freed pages are returned to the file system, so the file stays
+    bounded.
+    """
+
+    def __init__(self, file_path, batch_size=500, retention=3600.0, retention_interval=60.0, read_only=False):
+        self.file_path = file_path
+        self.connection = connect(file_path, read_only)
+        self.lock = threading.Lock()
+        self.batch_size = batch_size
+        self.retention = retention
+        self.retention_interval = retention_interval
+        self.last_retention = time.time()
+        self.pending = []
+
+    def add_decision(self, xapp_id, decision):
+        """Buffer a decision dict (the xapp_decisions_N.csv columns)."""
+        with self.lock:
+            self.pending.append((decision["Time"], xapp_id, decision["Control_Target_Type"],
+                                 str(decision["Control_Target_ID"]), decision["Parameter_Name"],
+                                 float(decision["Parameter_Value"])))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+            if self.retention and time.time() - self.last_retention >= self.retention_interval:
+                self._apply_retention(time.time())
+
+    def _flush(self):
+        if not self.pending:
+            return
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany("INSERT INTO decisions (time, xapp_id, target_type, target_id, parameter, "
+                                        "value) VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def apply_retention(self, now=None):
+        """Delete decisions older than the retention; returns the number of deleted rows."""
+        with self.lock:
+            return self._apply_retention(time.time() if now is None else now)
+
+    def _apply_retention(self, now):
+        self.last_retention = now
+        deleted = self.connection.execute("DELETE FROM decisions WHERE time < ?", (now - self.retention,)).rowcount
+        if deleted:
+            vacuum(self.connection)
+        return deleted
+
+    def recent_records(self, xapp_id, since):
+        """Decisions of an xApp with time >= since, as DecisionRecords; an index range scan on (xapp_id, time)."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT time, target_type, target_id, parameter, value FROM decisions "
+                "WHERE xapp_id = ? AND time >= ? ORDER BY time", (xapp_id, since)).fetchall()
+        return to_records(rows)
+
+    def last_id_before(self, since):
+        """Row ID after which the decisions with time >= since start, e.g. to read only the current window."""
+        with self.lock:
+            first_id, last_id = self.connection.execute(
+                "SELECT (SELECT min(id) FROM decisions WHERE time >= ?), (SELECT max(id) FROM decisions)",
+                (since,)).fetchone()
+        if first_id is not None:
+            return first_id - 1
+        return last_id or 0
+
+    def new_records(self, after_id):
+        """Decisions inserted after the row with ID after_id; returns (last row ID, {xapp_id: DecisionRecords})."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, xapp_id, time, target_type, target_id, parameter, value FROM decisions "
+                "WHERE id > ? ORDER BY id", (after_id,)).fetchall()
+        rows_by_xapp = {}
+        for row in rows:
+            rows_by_xapp.setdefault(row[1], []).append(row[2:])
+        return (rows[-1][0] if rows else after_id), {xapp_id: to_records(xapp_rows)
+                                                    for xapp_id, xapp_rows in rows_by_xapp.items()}
+
+    def query(self, target_id=None, parameter=None, xapp_id=None, start=None, end=None, target_type="USER"):
+        """Decisions in [start, end) filtered by target, parameter and xApp, as (time, xApp, target type, target,
+        parameter, value) rows ordered by time."""
+        conditions = []
+        arguments = []
+        if target_id is not None:
+            conditions += ["target_type = ?", "target_id = ?"]
+            arguments += [target_type, target_id]
+        for column, value in (("parameter", parameter), ("xapp_id", xapp_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                arguments.append(value)
+        if start is not None:
+            conditions.append("time >= ?")
+            arguments.append(start)
+        if end is not None:
+            conditions.append("time < ?")
+            arguments.append(end)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        with self.lock:
+            return self.connection.execute("SELECT time, xapp_id, target_type, target_id, parameter, value "
+                                           "FROM decisions" + where + " ORDER BY time", arguments).fetchall()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.connection.close()
+
+
+class SqliteMeasurementWriter(object):
+    """MeasurementLogger writer for the measurements table of a store database.
+
+    Measurements older than retention seconds are deleted on flush, at most every retention_interval seconds,
+    instead of rotating the file.
+    """
+
+    def __init__(self, file_path, retention=3600.0, retention_interval=60.0):
+        self.connection = connect(file_path)
+        self.retention = retention
+        self.retention_interval = retention_interval
+        self.last_retention = time.time()
+        self.pending = []
+
+    def write(self, collet_start_time, latency, samples):
+        now = time.time()
+        collet_start_time = str(collet_start_time)
+        self.pending.extend((now, collet_start_time, int(ue_id), metric_name, float(value), latency)
+                            for ue_id, metric_name, value in samples)
+
+    def flush(self):
+        if self.pending:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+            self.pending = []
+        now = time.time()
+        if self.retention and now - self.last_retention >= self.retention_interval:
+            self.last_retention = now
+            if self.connection.execute("DELETE FROM measurements WHERE time < ?",
+                                       (now - self.retention,)).rowcount:
+                vacuum(self.connection)
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query control decisions in a decision store')
+    parser.add_argument("file_path", type=str, help="Decision store database")
+    parser.add_argument("--target_id", type=str, default=None, help="Control target ID, e.g. gnbd_001_001_00019b_0/2")
+    parser.add_argument("--parameter", type=str, default=None, help="Parameter name, e.g. PRB_ALLOCATION")
+    parser.add_argument("--xapp_id", type=int, default=None, help="Only decisions of this xApp")
+    parser.add_argument("--last", type=float, default=None, help="Only decisions of the last N seconds")
+    args = parser.parse_args()
+
+    try:
+        store = DecisionStore(args.file_path, read_only=True)
+        start = time.time() - args.last if args.last is not None else None
+        rows = store.query(args.target_id, args.parameter, args.xapp_id, start)
+    except sqlite3.Error as e:
+        parser.exit(1, f"Cannot read decision store {args.file_path}: {e}\n")
+    for decision_time, xapp_id, target_type, target_id, parameter, value in rows:
+        print(f"{datetime.datetime.fromtimestamp(decision_time)} xApp #{xapp_id} {target_type} {target_id} "
+              f"{parameter} = {value}")
+    store.close()
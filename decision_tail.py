@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import csv
+import operator
+import collections
+from compact_records import DecisionRecord, target_types, parameter_names
+
+
+def parse_decision_row(row):
+    """Convert a decision CSV row into the decision dict used by the CMF."""
+    return {
+        "Time": float(row["Time"]),
+        "Datetime": row["Datetime"],
+        "Control_Target_Type": row["Control_Target_Type"],
+        "Control_Target_ID": row["Control_Target_ID"],
+        "Parameter_Name": row["Parameter_Name"],
+        "Parameter_Value": float(row["Parameter_Value"]),
+    }
+
+
+class DecisionTailReader(object):
+    """Parse only the rows appended to a decision CSV file since the previous read.
+
+    The byte offset of the last complete line is kept between reads, and only advanced once the new lines have
+    been parsed. If the file shrinks below that offset (truncation) or is replaced by a new file (rotation),
+    reading restarts from the beginning of the new file.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.offset = 0
+        self.inode = None
+        self.header = None
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.header = None
+
+    def _read_new_lines(self):
+        """Return (header, complete lines appended since the previous read without the header, offset after them).
+
+        The offset is not advanced here; callers commit header and offset once the lines are parsed, so a
+        failure while parsing leaves the lines to be read again.
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            self.reset()
+            return None, [], 0
+
+        if self.inode is not None and (stat.st_ino != self.inode or stat.st_size < self.offset):
+            print(f"Decision file {self.file_path} was truncated or rotated, reading from the start")
+            self.reset()
+        self.inode = stat.st_ino
+        if stat.st_size == self.offset:
+            return self.header, [], self.offset
+
+        with open(self.file_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        # Leave an incomplete last line (writer still appending) for the next read
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return self.header, [], self.offset
+
+        lines = []
+        for line in data[:end].splitlines():
+            try:
+                lines.append(line.decode("utf-8"))
+            except UnicodeDecodeError as e:
+                print(f"Skipping undecodable line in {self.file_path}: {e}")
+        header = self.header
+        if header is None and lines:
+            header = next(csv.reader(lines[:1]))
+            lines = lines[1:]
+        return header, lines, self.offset + end
+
+    def read_new_decisions(self):
+        header, lines, offset = self._read_new_lines()
+        decisions = []
+        for row in csv.DictReader(lines, fieldnames=header):
+            try:
+                decisions.append(parse_decision_row(row))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping malformed decision in {self.file_path}: {e}")
+        self.header, self.offset = header, offset
+        return decisions
+
+    def read_new_records(self):
+        """Like read_new_decisions, but parse the rows straight into compact DecisionRecords."""
+        header, lines, offset = self._read_new_lines()
+        if not lines:
+            self.header, self.offset = header, offset
+            return []
+        try:
+            columns = [header.index(name) for name in
+                       ("Time", "Control_Target_Type", "Control_Target_ID", "Parameter_Name", "Parameter_Value")]
+        except ValueError as e:
+            # The rows cannot be parsed with this header however often they are read
+            print(f"Skipping decisions in {self.file_path}, unexpected header: {e}")
+            self.header, self.offset = header, offset
+            return []
+        time_column, type_column, target_column, parameter_column, value_column = columns
+        target_type_code = target_types.code
+        parameter_code = parameter_names.code
+        intern = sys.intern
+
+        records = []
+        for row in csv.reader(lines):
+            try:
+                records.append(DecisionRecord(float(row[time_column]), target_type_code(row[type_column]),
+                                              intern(row[target_column]), parameter_code(row[parameter_column]),
+                                              float(row[value_column])))
+            except (IndexError, ValueError) as e:
+                print(f"Skipping malformed decision in {self.file_path}: {e}")
+        self.header, self.offset = header, offset
+        return records
+
+
+class DecisionWindow(object):
+    """Sliding window of recent decisions that evicts by decision time.
+
+    Holds decision dicts by default; pass time_of=compact_records.RECORD_TIME for DecisionRecords.
+    """
+
+    def __init__(self, time_threshold, time_of=operator.itemgetter("Time")):
+        self.time_threshold = time_threshold
+        self.time_of = time_of
+        self.decisions = collections.deque()
+
+    def extend(self, decisions):
+        self.decisions.extend(decisions)
+
+    def evict(self, current_time):
+        time_of = self.time_of
+        while self.decisions and current_time - time_of(self.decisions[0]) > self.time_threshold:
+            self.decisions.popleft()
+
+    def recent(self, current_time):
+        self.evict(current_time)
+        # Rows are appended roughly in time order; filter again in case an older row follows a newer one
+        time_of = self.time_of
+        return [decision for decision in self.decisions if current_time - time_of(decision) <= self.time_threshold]
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import csv
+import sys
+import json
+import time
+import types
+import random
+import threading
+import collections
+
+# Local stand-in for the parts of the SC RIC xApp framework used by xapp_timing_1.py and xApp_CMF.py
+# (lib.xAppBase with its e2sm_kpm / e2sm_rc modules, and central_controller), backed by a simulated E2 node.
+# install() registers the stand-in modules, so the xApps can be imported and driven without RIC, gNB or UEs.
+
+
+class StandInE2Node(object):
+    """Simulated E2 node: delivers KPM indications to subscribers and records RIC control requests."""
+
+    def __init__(self, e2_node_id, control_delay=0.0):
+        self.e2_node_id = e2_node_id
+        self.control_delay = control_delay
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.control_requests = []
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscriptions.append(callback)
+            return len(self.subscriptions)
+
+    def deliver_indication(self, indication_hdr, indication_msg):
+        with self.lock:
+            subscriptions = list(enumerate(self.subscriptions, start=1))
+        for subscription_id, callback in subscriptions:
+            callback(self.e2_node_id, subscription_id, indication_hdr, indication_msg)
+
+    def control(self, request):
+        # Simulates the time until the RMR send returns
+        if self.control_delay:
+            time.sleep(self.control_delay)
+        request['received_time'] = time.monotonic()
+        with self.lock:
+            self.control_requests.append(request)
+
+
+class StandInRan(object):
+    """Registry of the simulated E2 nodes, shared by all stand-in xApp instances of a process."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.control_delay = 0.0
+
+    def node(self, e2_node_id):
+        if e2_node_id not in self.nodes:
+            self.nodes[e2_node_id] = StandInE2Node(e2_node_id, self.control_delay)
+        return self.nodes[e2_node_id]
+
+    def reset(self, control_delay=0.0):
+        self.nodes = {}
+        self.control_delay = control_delay
+
+
+ran = StandInRan()
+
+
+def encode_indication(collet_start_time, ue_values, metric_name='DRB.UEThpDl'):
+    """Encode one indication; ue_values maps UE ID to the metric value in bytes."""
+    indication_hdr = json.dumps({'colletStartTime': collet_start_time}).encode()
+    indication_msg = json.dumps({'ueMeasData': {
+        str(ue_id): {'measData': {metric_name: [value]}, 'granulPeriod': 1000}
+        for ue_id, value in ue_values.items()}}).encode()
+    return indication_hdr, indication_msg
+
+
+class StandInKpmModule(object):
+    def __init__(self, parent):
+        self.parent = parent
+        self.ran_func_id = None
+
+    def set_ran_func_id(self, ran_func_id):
+        self.ran_func_id = ran_func_id
+
+    def subscribe_report_service_style_4(self, e2_node_id, report_period, matchingUeConds, metric_names,
+                                         granul_period, subscription_callback):
+        ran.node(e2_node_id).subscribe(subscription_callback)
+
+    def extract_hdr_info(self, indication_hdr):
+        return json.loads(indication_hdr)
+
+    def extract_meas_data(self, indication_msg):
+        meas_data = json.loads(indication_msg)
+        meas_data['ueMeasData'] = {int(ue_id): ue_meas_data
+                                   for ue_id, ue_meas_data in meas_data['ueMeasData'].items()}
+        return meas_data
+
+
+class StandInRcModule(object):
+    def __init__(self, parent):
+        self.parent = parent
+        self.ran_func_id = None
+
+    def set_ran_func_id(self, ran_func_id):
+        self.ran_func_id = ran_func_id
+
+    def control_slice_level_prb_quota(self, e2_node_id, ue_id, min_prb_ratio=1, max_prb_ratio=100,
+                                      dedicated_prb_ratio=100, ack_request=1, sst=1, sd=1):
+        ran.node(e2_node_id).control({'sent_by': self.parent, 'ue_id': ue_id, 'min_prb_ratio': min_prb_ratio,
+                                      'max_prb_ratio': max_prb_ratio, 'dedicated_prb_ratio': dedicated_prb_ratio,
+                                      'sst': sst, 'sd': sd})
+
+
+class StandInXAppBase(object):
+    """Replacement for lib.xAppBase.xAppBase without RMR, subscription manager or HTTP server."""
+
+    def __init__(self, config=None, http_server_port=8090, rmr_port=4560, rmr_flags=0x00):
+        self.running = False
+        self.e2sm_kpm = StandInKpmModule(self)
+        self.e2sm_rc = StandInRcModule(self)
+
+    @staticmethod
+    def start_function(function):
+        def wrapper(self, *args, **kwargs):
+            self.running = True
+            function(self, *args, **kwargs)
+        return wrapper
+
+    def stop(self):
+        self.running = False
+
+    def signal_handler(self, sig, frame):
+        self.stop()
+
+
+class StandInCentralController(object):
+    def __init__(self):
+        self.messages = collections.deque(maxlen=10000)
+
+    def log_message(self, xapp_id, e2_node_id, ue_id, min_prb, max_prb, timestamp):
+        self.messages.append((xapp_id, e2_node_id, ue_id, min_prb, max_prb, timestamp))
+
+
+def install():
+    """Register the stand-in modules in place of lib.xAppBase and central_controller."""
+    lib_module = types.ModuleType('lib')
+    xapp_base_module = types.ModuleType('lib.xAppBase')
+    xapp_base_module.xAppBase = StandInXAppBase
+    lib_module.xAppBase = xapp_base_module
+    central_controller_module = types.ModuleType('central_controller')
+    central_controller_module.CentralController = StandInCentralController
+    sys.modules['lib'] = lib_module
+    sys.modules['lib.xAppBase'] = xapp_base_module
+    sys.modules['central_controller'] = central_controller_module
+
+
+def synthetic_indications(ue_count, count, seed=1):
+    """Deterministic synthetic indications with ue_count UEs, as (collet start time, {UE ID: bytes})."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield str(index), {ue_id: rng.randrange(1000, 10000000) for ue_id in range(ue_count)}
+
+
+def recorded_indications(file_path):
+    """Indications recorded in a measurement log (xapp_timing_1.csv), grouped by their Time column."""
+    indications = collections.OrderedDict()
+    with open(file_path, newline='') as f:
+        for row in csv.DictReader(f):
+            # The log holds MB; convert back to the bytes reported by the E2 node
+            indications.setdefault(row['Time'], {})[int(row['UE_id'])] = float(row['Value']) * 8 * 1000
+    return list(indications.items())
+
+
+def replay(e2_node_id, indications, rate=None):
+    """Deliver indications to the subscribers of an E2 node, at rate per second or as fast as possible.
+
+    Returns the number of indications delivered.
+    """
+    node = ran.node(e2_node_id)
+    interval = 1.0 / rate if rate else 0
+    next_time = time.monotonic()
+    delivered = 0
+    for collet_start_time, ue_values in indications:
+        if interval:
+            next_time += interval
+            time.sleep(max(0.0, next_time - time.monotonic()))
+        node.deliver_indication(*encode_indication(collet_start_time, ue_values))
+        delivered += 1
+    return delivered
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import math
+import time
+import threading
+
+
+class ExecutionScheduler(object):
+    """Deadline-based scheduler for the control rounds of one xApp instance.
+
+    Rounds are due at every t with t % period == phase (seconds on the wall clock, so that xApp instances on
+    the same host, or on NTP-synchronized hosts, keep their slots apart). The grid is aligned on the wall clock
+    once, when the scheduler is created, and then followed on the monotonic clock, so a wall clock step (e.g.
+    by NTP) neither stalls nor bunches rounds. Deadlines are computed from the slot grid rather than by
+    accumulating sleeps, so waking up late never shifts later rounds, and a late wake-up still runs the round
+    it was waiting for instead of missing the slot. trigger() runs a round before the next deadline, e.g. when
+    a KPM indication changes the UE count.
+    """
+
+    def __init__(self, period=10.0, phase=0.0):
+        if period <= 0:
+            raise ValueError("Execution period must be positive")
+        self.period = period
+        self.phase = phase % period
+        self.event = threading.Event()
+        self.stopped = False
+        self.clock_offset = time.time() - time.monotonic()
+        self.next_deadline = self.next_slot(self.now())
+
+    def now(self):
+        """Wall clock time as of the scheduler's creation, advanced by the monotonic clock."""
+        return time.monotonic() + self.clock_offset
+
+    def next_slot(self, now):
+        """First slot strictly after now."""
+        return (math.floor((now - self.phase) / self.period) + 1) * self.period + self.phase
+
+    def trigger(self):
+        self.event.set()
+
+    def stop(self):
+        self.stopped = True
+        self.event.set()
+
+    def wait(self):
+        """Block until the next round is due.
+
+        Returns (reason, deadline, lateness): reason is 'deadline', 'trigger' or 'stopped', deadline the slot
+        that was waited for and lateness the seconds between that slot and waking up (0 if triggered).
+        """
+        deadline = self.next_deadline
+        while not self.stopped:
+            remaining = deadline - self.now()
+            if remaining <= 0:
+                now = self.now()
+                self.next_deadline = self.next_slot(now)
+                return 'deadline', deadline, now - deadline
+            if self.event.wait(remaining):
+                self.event.clear()
+                if self.stopped:
+                    break
+                # The scheduled slot stays due; a triggered round does not shift the grid
+                return 'trigger', deadline, 0.0
+        return 'stopped', deadline, 0.0
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+
+IMPORT_TIME = time.time()
+
+
+def process_start_time():
+    """Wall-clock time at which this process started, from /proc (10 ms resolution).
+
+    Falls back to the time this module was imported where /proc is not available.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name, which may contain spaces; starttime is field 22 of the full line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return IMPORT_TIME
+
+
+def save_snapshot(file_path, ue_counts, quotas):
+    """Persist the UE counts ({e2_node_id: count}) and QuotaCache entries needed for a fast restart.
+
+    The file is replaced atomically, so a crash while writing leaves the previous snapshot.
+    """
+    snapshot = {
+        "time": time.time(),
+        "ue_counts": [[e2_node_id, count] for e2_node_id, count in ue_counts.items()],
+        "quotas": quotas,
+    }
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(temporary_path, file_path)
+
+
+def load_snapshot(file_path, max_age):
+    """Return (ue_counts, quotas) from a snapshot not older than max_age seconds, None if there is none."""
+    try:
+        with open(file_path) as f:
+            snapshot = json.load(f)
+        age = time.time() - snapshot["time"]
+        if age > max_age:
+            print(f"Snapshot {file_path} is {age:.0f} s old, not restored")
+            return None
+        return {e2_node_id: count for e2_node_id, count in snapshot["ue_counts"]}, snapshot["quotas"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Snapshot {file_path} not restored: {e}")
+        return None
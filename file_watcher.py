@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class DecisionWatcher(object):
+    """Wake the CMF as soon as a watched decision file is written or a decision is pushed in.
+
+    File changes are picked up with Linux inotify (through libc, no extra dependency). When inotify is not
+    available, wait() degrades to a plain polling interval; notify() wakes the waiter in both cases.
+    """
+
+    def __init__(self, file_paths):
+        self.file_names = set(os.path.basename(file_path) for file_path in file_paths)
+        self.directories = set(os.path.dirname(os.path.abspath(file_path)) for file_path in file_paths)
+        self.event = threading.Event()
+        self.inotify_fd = None
+        try:
+            self.inotify_fd = self._init_inotify()
+        except (OSError, AttributeError) as e:
+            print(f"File watcher not available, falling back to polling: {e}")
+            return
+        threading.Thread(target=self._read_inotify_events, name="decision-watcher", daemon=True).start()
+
+    @property
+    def event_driven(self):
+        return self.inotify_fd is not None
+
+    def _init_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in self.directories:
+            # Watch the directory so that files created or rotated later are covered as well
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, f"inotify_add_watch failed for {directory}")
+        return fd
+
+    def _read_inotify_events(self):
+        while self.inotify_fd is not None:
+            try:
+                data = os.read(self.inotify_fd, 4096)
+            except OSError:
+                return
+            offset = 0
+            while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, name_length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+                offset += INOTIFY_EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b"\0").decode(errors="replace")
+                offset += name_length
+                if name in self.file_names:
+                    self.event.set()
+
+    def notify(self):
+        """Wake the waiter, e.g. when a decision is pushed in directly instead of written to a file."""
+        self.event.set()
+
+    def wait(self, timeout):
+        """Block until a watched file changes, notify() is called or the timeout expires.
+
+        Returns True if woken by an event, False on timeout.
+        """
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
+
+    def close(self):
+        if self.inotify_fd is not None:
+            fd, self.inotify_fd = self.inotify_fd, None
+            os.close(fd)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import threading
+from streaming_stats import StreamingStats
+
+
+class Instrumentation(object):
+    """Hot-path latency instrumentation with monotonic timestamps and per-stage latency statistics.
+
+    Usage: t = instrumentation.now(); ...; instrumentation.record("stage", t). When disabled, both calls
+    return immediately, so instrumentation can be switched off at runtime without touching the call sites.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {}
+        # name -> function returning the current value, e.g. a queue depth
+        self.gauges = {}
+
+    def now(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, stage, start_ns, end_ns=None):
+        """Record the duration of a stage that started at start_ns (from now())."""
+        if not self.enabled or not start_ns:
+            return
+        if end_ns is None:
+            end_ns = time.perf_counter_ns()
+        self.record_duration(stage, end_ns - start_ns)
+
+    def record_duration(self, stage, duration_ns):
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StreamingStats()
+            stats.add(max(0, duration_ns) / 1e9)
+
+    def register_gauge(self, name, read):
+        self.gauges[name] = read
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                # Latencies in milliseconds
+                "stages": {stage: stats.summary(scale=1000) for stage, stats in sorted(self.stages.items())},
+                "gauges": {name: read() for name, read in sorted(self.gauges.items())},
+            }
+
+
+def register_http_handlers(xapp, instrumentation):
+    """Expose the latency statistics on the xApp's HTTP server (http_server_port).
+
+    GET /ric/v1/latency returns the per-stage summary as JSON, GET /ric/v1/instrumentation/enable and
+    /ric/v1/instrumentation/disable switch recording on and off.
+    """
+    server = getattr(xapp, "server", None)
+    if server is None:
+        print("xApp HTTP server not available, latency metrics are not exposed")
+        return False
+    from ricxappframe.xapp_rest import initResponse
+
+    def respond(payload):
+        response = initResponse()
+        response['payload'] = json.dumps(payload)
+        return response
+
+    def latency_handler(name, path, data, ctype):
+        return respond(instrumentation.snapshot())
+
+    def enable_handler(name, path, data, ctype):
+        instrumentation.set_enabled(True)
+        return respond({"enabled": True})
+
+    def disable_handler(name, path, data, ctype):
+        instrumentation.set_enabled(False)
+        return respond({"enabled": False})
+
+    server.handler.add_handler(server.handler, "GET", "latency", "/ric/v1/latency", latency_handler)
+    server.handler.add_handler(server.handler, "GET", "instrumentationEnable", "/ric/v1/instrumentation/enable",
+                               enable_handler)
+    server.handler.add_handler(server.handler, "GET", "instrumentationDisable", "/ric/v1/instrumentation/disable",
+                               disable_handler)
+    return True
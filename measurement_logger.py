@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import time
+import queue
+import struct
+import threading
+from compact_records import MeasurementBatch, metric_names
+
+CSV_HEADERS = ['Time', 'UE_id', 'Metric', 'Value', 'latency']
+
+# Binary format: a sequence of records, each starting with a one-byte type
+#   b'M' <uint16 code> <uint16 length> <name>     defines a metric name code (before its first sample in the file)
+#   b'T' <uint16 length> <colletStartTime>        sets the time of the following samples
+#   b'S' <int64 UE_id> <uint16 code> <float64 value> <float64 latency>
+METRIC_RECORD = struct.Struct("<HH")
+TIME_RECORD = struct.Struct("<H")
+SAMPLE_RECORD = struct.Struct("<qHdd")
+
+
+class CsvMeasurementWriter(object):
+    def __init__(self, file_path):
+        self.file = open(file_path, 'a', newline='', buffering=1024 * 1024)
+        self.csv_writer = csv.writer(self.file)
+        # Write headers only once (if file is empty)
+        if self.file.tell() == 0:
+            self.csv_writer.writerow(CSV_HEADERS)
+
+    def write(self, collet_start_time, latency, samples):
+        self.csv_writer.writerows([collet_start_time, ue_id, metric_name, value, latency]
+                                  for ue_id, metric_name, value in samples)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryMeasurementWriter(object):
+    def __init__(self, file_path):
+        self.file = open(file_path, 'ab', buffering=1024 * 1024)
+        # Interned metric codes already defined in this file
+        self.defined_codes = set()
+
+    def write(self, collet_start_time, latency, samples):
+        encoded_time = str(collet_start_time).encode()
+        chunks = [b'T', TIME_RECORD.pack(len(encoded_time)), encoded_time]
+        if isinstance(samples, MeasurementBatch):
+            coded_samples = zip(samples.ue_ids, samples.metric_codes, samples.values)
+        else:
+            coded_samples = ((ue_id, metric_names.code(metric_name), value) for ue_id, metric_name, value in samples)
+        for ue_id, code, value in coded_samples:
+            if code not in self.defined_codes:
+                self.defined_codes.add(code)
+                encoded_name = metric_names.value(code).encode()
+                chunks += [b'M', METRIC_RECORD.pack(code, len(encoded_name)), encoded_name]
+            chunks += [b'S', SAMPLE_RECORD.pack(int(ue_id), code, float(value), latency)]
+        self.file.write(b''.join(chunks))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_binary_log(file_path):
+    """Yield [Time, UE_id, Metric, Value, latency] rows from a binary measurement log."""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    metric_names = {}
+    collet_start_time = None
+    offset = 0
+    while offset < len(data):
+        record_type = data[offset:offset + 1]
+        offset += 1
+        if record_type == b'S':
+            ue_id, code, value, latency = SAMPLE_RECORD.unpack_from(data, offset)
+            offset += SAMPLE_RECORD.size
+            yield [collet_start_time, ue_id, metric_names[code], value, latency]
+        elif record_type == b'T':
+            length, = TIME_RECORD.unpack_from(data, offset)
+            offset += TIME_RECORD.size
+            collet_start_time = data[offset:offset + length].decode()
+            offset += length
+        elif record_type == b'M':
+            code, length = METRIC_RECORD.unpack_from(data, offset)
+            offset += METRIC_RECORD.size
+            metric_names[code] = data[offset:offset + length].decode()
+            offset += length
+        else:
+            raise ValueError(f"Unknown record type {record_type!r} at offset {offset - 1} in {file_path}")
+
+
+def sqlite_measurement_writer(file_path):
+    # sqlite3 is only imported when the SQLite format is used
+    from decision_store import SqliteMeasurementWriter
+    return SqliteMeasurementWriter(file_path)
+
+
+class MeasurementLogger(object):
+    """Write KPM measurements from a background thread so that the RMR receive path only enqueues.
+
+    Indications wait in a bounded queue; when it is full they are dropped and counted rather than blocking
+    the caller. Rows are written in batches of batch_size or every flush_interval seconds, whichever comes
+    first, and CSV and binary files are rotated to file.1 ... file.N once they grow beyond max_bytes (SQLite
+    databases delete old rows instead).
+    """
+
+    writers = {'csv': CsvMeasurementWriter, 'binary': BinaryMeasurementWriter, 'sqlite': sqlite_measurement_writer}
+
+    def __init__(self, file_path, file_format='csv', queue_size=1000, batch_size=500, flush_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, backup_count=5):
+        if file_format not in self.writers:
+            raise ValueError(f"Unknown measurement log format: {file_format}")
+        self.file_path = file_path
+        self.file_format = file_format
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped_indications = 0
+        self.written_rows = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._write_loop, name="measurement-logger", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Flush everything still queued and stop the writer thread."""
+        self.running = False
+        if self.thread is not None:
+            # Wake the writer thread if it is waiting for the next indication
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self.thread.join()
+            self.thread = None
+
+    def log_indication(self, collet_start_time, latency, samples):
+        """Queue the samples of one indication; returns False if dropped.
+
+        samples is a MeasurementBatch or a list of (UE_id, metric name, value) tuples.
+        """
+        try:
+            self.queue.put_nowait((collet_start_time, latency, samples))
+            return True
+        except queue.Full:
+            self.dropped_indications += 1
+            return False
+
+    def _write_loop(self):
+        writer = self.writers[self.file_format](self.file_path)
+        pending_rows = 0
+        last_flush = time.monotonic()
+        while self.running or not self.queue.empty():
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is not None:
+                    collet_start_time, latency, samples = item
+                    writer.write(collet_start_time, latency, samples)
+                    pending_rows += len(samples)
+            except queue.Empty:
+                pass
+
+            if pending_rows >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                if pending_rows:
+                    writer.flush()
+                    self.written_rows += pending_rows
+                    pending_rows = 0
+                    if self.file_format != 'sqlite' and os.path.getsize(self.file_path) >= self.max_bytes:
+                        writer.close()
+                        self._rotate()
+                        writer = self.writers[self.file_format](self.file_path)
+                last_flush = time.monotonic()
+
+        writer.flush()
+        self.written_rows += pending_rows
+        writer.close()
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.file_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import time
+
+
+class QuotaCache(object):
+    """Last acknowledged PRB quota per (E2 node, slice, UE), used to send only changed allocations.
+
+    A quota equal to the cached one is suppressed unless it was last sent refresh_interval seconds ago or more;
+    the periodic resend keeps the E2 node from drifting if a control request was lost or the node restarted,
+    and keeps the quota in the CMF's detection window. A refresh_interval of 0 disables suppression.
+
+    Quotas are timed by the planning time of the round that sent them (the now passed to should_send), not by
+    when the fan-out sent them, and a refresh due within jitter seconds of a round is sent in that round. With
+    the default execution period equal to the refresh interval, every round therefore resends its quotas;
+    suppression takes effect for shorter periods and for rounds triggered by UE count changes.
+    """
+
+    def __init__(self, refresh_interval=10.0, jitter=1.0):
+        self.refresh_interval = refresh_interval
+        self.jitter = jitter
+        self.quotas = {}  # (e2_node_id, sd, ue_id) -> (quota, planning time of the round that sent it)
+        self.sent = 0
+        self.suppressed = 0
+        self.refreshed = 0
+
+    def should_send(self, e2_node_id, sd, ue_id, quota, now=None):
+        cached = self.quotas.get((e2_node_id, sd, ue_id))
+        if cached is None or cached[0] != quota or self.refresh_interval <= 0:
+            return True
+        if (time.time() if now is None else now) - cached[1] >= self.refresh_interval - self.jitter:
+            self.refreshed += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def acknowledge(self, e2_node_id, sd, ue_id, quota, planned_time):
+        """Cache an acknowledged quota, timed by the planning time of its round."""
+        self.quotas[(e2_node_id, sd, ue_id)] = (quota, planned_time)
+        self.sent += 1
+
+    def forget(self, e2_node_id, sd, ue_id):
+        """Forget the cached quota of one UE, so that it is resent when it is next allocated."""
+        self.quotas.pop((e2_node_id, sd, ue_id), None)
+
+    def invalidate(self, e2_node_id=None):
+        """Forget cached quotas (of one E2 node), so that the next round resends them."""
+        if e2_node_id is None:
+            self.quotas.clear()
+        else:
+            self.quotas = {key: value for key, value in self.quotas.items() if key[0] != e2_node_id}
+
+    def snapshot(self):
+        """Cached quotas as [e2_node_id, sd, ue_id, quota, planning time] lists, e.g. to save them across restarts."""
+        return [[e2_node_id, sd, ue_id, quota, planned_time]
+                for (e2_node_id, sd, ue_id), (quota, planned_time) in self.quotas.items()]
+
+    def restore(self, entries):
+        for e2_node_id, sd, ue_id, quota, planned_time in entries:
+            self.quotas[(e2_node_id, sd, ue_id)] = (quota, planned_time)
+
+    def counters(self):
+        return {"sent": self.sent, "suppressed": self.suppressed, "refreshed": self.refreshed}
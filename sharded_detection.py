@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import time
+import zlib
+import queue
+import multiprocessing
+from conflict_index import ConflictIndex
+from conflict_resolution import ConflictResolver
+from decision_tail import DecisionWindow
+from compact_records import RECORD_TIME
+
+
+def shard_of(control_target_id, shard_count):
+    """Stable shard of a control target; every decision for one target lands on the same worker."""
+    return zlib.crc32(control_target_id.encode()) % shard_count
+
+
+def _shard_worker(requests, results, time_threshold, policy, priority_table, block_ttl, hold_ttl):
+    """Worker process: sliding windows and conflict resolution for the targets of one shard.
+
+    Runs until it receives None. ("decisions", xapp_id, records) extends the window of an xApp and
+    ("detect", now) answers with the shard's (conflicts, new_blocks, lifted_blocks, latest decision time of the
+    new blocks, detection time in seconds).
+    """
+    windows = {}
+    resolver = ConflictResolver(policy, priority_table, block_ttl, hold_ttl)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        if request[0] == "decisions":
+            _, xapp_id, decisions = request
+            if xapp_id not in windows:
+                windows[xapp_id] = DecisionWindow(time_threshold, RECORD_TIME)
+            windows[xapp_id].extend(decisions)
+        elif request[0] == "detect":
+            detect_start = time.perf_counter()
+            now = request[1]
+            conflict_index = ConflictIndex()
+            for xapp_id, window in windows.items():
+                conflict_index.add_records(xapp_id, window.recent(now))
+            conflicts, new_blocks, lifted_blocks = resolver.resolve(conflict_index, now)
+            latest_decision_time = max((conflict_index.latest_times[key] for _, key in new_blocks), default=None)
+            results.put((conflicts, new_blocks, lifted_blocks, latest_decision_time,
+                         time.perf_counter() - detect_start))
+
+
+class ShardedConflictDetector(object):
+    """Conflict detection and resolution spread over worker processes by Control_Target_ID.
+
+    Decisions can only conflict when they share a target, so each worker holds the sliding windows of its
+    targets and resolves them independently; the coordinator only partitions new decisions and merges the
+    verdicts. Exposes the same resolve results and blocked_keys() as a single ConflictResolver.
+
+    Workers are spawned rather than forked, since the CMF already runs RMR and HTTP threads when they start. A
+    worker that dies or does not answer a detection cycle within result_timeout seconds is replaced by a fresh
+    one; the blocks of its shard are kept until they would have expired, unless the new worker renews them.
+    """
+
+    def __init__(self, worker_count, time_threshold=10, policy="priority", priority_table=None, block_ttl=10.0,
+                 hold_ttl=None, result_timeout=5.0):
+        self.worker_count = worker_count
+        self.time_threshold = time_threshold
+        self.policy_name = policy
+        self.block_ttl = block_ttl
+        # Validates the policy before any worker is started
+        self.hold_ttl = ConflictResolver(policy, priority_table, block_ttl, hold_ttl).hold_ttl
+        self.result_timeout = result_timeout
+        self.context = multiprocessing.get_context("spawn")
+        self.priority_table = priority_table
+        self.request_queues = []
+        self.result_queues = []
+        self.workers = []
+        self.blocks = set()  # (xapp_id, key) over all shards
+        self.orphaned_blocks = {}  # (xapp_id, key) of restarted shards -> expiry time
+        self.worker_times = [0.0] * worker_count
+        self.restarts = 0
+
+    def start(self):
+        for shard in range(self.worker_count):
+            requests, results, worker = self._start_worker(shard)
+            self.request_queues.append(requests)
+            self.result_queues.append(results)
+            self.workers.append(worker)
+
+    def _start_worker(self, shard):
+        requests = self.context.Queue()
+        results = self.context.Queue()
+        worker = self.context.Process(target=_shard_worker, name=f"cmf-shard-{shard}", daemon=True,
+                                      args=(requests, results, self.time_threshold, self.policy_name,
+                                            self.priority_table, self.block_ttl, self.hold_ttl))
+        worker.start()
+        return requests, results, worker
+
+    def _restart_worker(self, shard, now):
+        """Replace a dead or stuck worker; the decisions in its windows are lost."""
+        worker = self.workers[shard]
+        print(f"CMF shard {shard} worker {'did not answer' if worker.is_alive() else 'died'}, restarting it")
+        if worker.is_alive():
+            worker.terminate()
+        worker.join(1)
+        self.request_queues[shard], self.result_queues[shard], self.workers[shard] = self._start_worker(shard)
+        self.restarts += 1
+        expiry = now + max(self.block_ttl, self.hold_ttl)
+        for block in self.blocks:
+            if shard_of(block[1][1], self.worker_count) == shard:
+                self.orphaned_blocks[block] = expiry
+
+    def _result(self, shard):
+        """Wait for a shard's detection result; None if its worker dies or does not answer in time."""
+        deadline = time.monotonic() + self.result_timeout
+        while True:
+            try:
+                return self.result_queues[shard].get(timeout=min(0.5, max(deadline - time.monotonic(), 0.01)))
+            except queue.Empty:
+                if not self.workers[shard].is_alive() or time.monotonic() >= deadline:
+                    return None
+
+    def stop(self):
+        for requests in self.request_queues:
+            requests.put(None)
+        for worker in self.workers:
+            worker.join(5)
+        self.request_queues = []
+        self.result_queues = []
+        self.workers = []
+
+    def add(self, xapp_id, records):
+        """Partition new DecisionRecords of an xApp onto the shards; one message per shard."""
+        if not records:
+            return
+        shards = [[] for _ in range(self.worker_count)]
+        for record in records:
+            shards[shard_of(record.target_id, self.worker_count)].append(record)
+        for requests, shard_decisions in zip(self.request_queues, shards):
+            if shard_decisions:
+                requests.put(("decisions", xapp_id, shard_decisions))
+
+    def resolve(self, now):
+        """Run one detection cycle on all shards in parallel and merge the verdicts.
+
+        Returns (conflicts, new_blocks, lifted_blocks, latest decision time of the new blocks or None).
+        """
+        for requests in self.request_queues:
+            requests.put(("detect", now))
+        conflicts = {}
+        new_blocks = []
+        lifted_blocks = []
+        latest_decision_time = None
+        for shard in range(self.worker_count):
+            result = self._result(shard)
+            if result is None:
+                self._restart_worker(shard, now)
+                continue
+            shard_conflicts, shard_new_blocks, shard_lifted_blocks, shard_latest_time, worker_time = result
+            conflicts.update(shard_conflicts)
+            new_blocks.extend(shard_new_blocks)
+            lifted_blocks.extend(shard_lifted_blocks)
+            if shard_latest_time is not None:
+                latest_decision_time = max(latest_decision_time or shard_latest_time, shard_latest_time)
+            self.worker_times[shard] = worker_time
+        self.blocks.update(new_blocks)
+        self.blocks.difference_update(lifted_blocks)
+        for block in new_blocks + lifted_blocks:
+            self.orphaned_blocks.pop(block, None)
+        for block, expiry in list(self.orphaned_blocks.items()):
+            if expiry <= now:
+                del self.orphaned_blocks[block]
+                if block in self.blocks:
+                    self.blocks.discard(block)
+                    lifted_blocks.append(block)
+        return conflicts, new_blocks, lifted_blocks, latest_decision_time
+
+    def blocked_keys(self, xapp_id):
+        return sorted(key for blocked_xapp_id, key in self.blocks if blocked_xapp_id == xapp_id)
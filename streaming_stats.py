@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import math
+import time
+
+
+class QuantileSketch(object):
+    """Mergeable quantile sketch with bounded relative error, for non-negative values.
+
+    Values are counted in logarithmic buckets (gamma = (1 + a) / (1 - a) for relative accuracy a), so memory
+    depends on the dynamic range of the values, not on how many were added, and two sketches with the same
+    accuracy merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different relative accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class SlidingWindowRate(object):
+    """Events per second over the last window seconds, counted in a fixed ring of time slots."""
+
+    def __init__(self, window=60.0, slot_count=60):
+        self.window = window
+        self.slot_length = window / slot_count
+        self.counts = [0] * slot_count
+        self.slot_ids = [-1] * slot_count
+
+    def add(self, count=1, now=None):
+        slot_id = int((time.monotonic() if now is None else now) / self.slot_length)
+        slot = slot_id % len(self.counts)
+        if self.slot_ids[slot] != slot_id:
+            self.slot_ids[slot] = slot_id
+            self.counts[slot] = 0
+        self.counts[slot] += count
+
+    def merge(self, other):
+        if (other.window, len(other.counts)) != (self.window, len(self.counts)):
+            raise ValueError("Cannot merge sliding window rates with different windows")
+        for slot, slot_id in enumerate(other.slot_ids):
+            if slot_id > self.slot_ids[slot]:
+                self.slot_ids[slot], self.counts[slot] = slot_id, other.counts[slot]
+            elif slot_id == self.slot_ids[slot]:
+                self.counts[slot] += other.counts[slot]
+
+    def rate(self, now=None):
+        current_slot_id = int((time.monotonic() if now is None else now) / self.slot_length)
+        oldest_slot_id = current_slot_id - len(self.counts)
+        total = sum(count for count, slot_id in zip(self.counts, self.slot_ids) if slot_id > oldest_slot_id)
+        return total / self.window
+
+
+class StreamingStats(object):
+    """Constant-memory statistics of a stream of values (e.g. latencies in seconds).
+
+    Tracks count, min/max, running mean and variance (Welford), quantiles (QuantileSketch) and the rate of
+    values over a sliding window. Instances with the same configuration can be merged, e.g. to combine
+    per-thread or per-worker statistics.
+    """
+
+    def __init__(self, rate_window=60.0, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.window_rate = SlidingWindowRate(rate_window)
+
+    def add(self, value, now=None):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+        self.window_rate.add(1, now)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        self.window_rate.merge(other.window_rate)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def rate(self, now=None):
+        return self.window_rate.rate(now)
+
+    def summary(self, scale=1.0):
+        """Summary dict; values are multiplied by scale (e.g. 1000 for seconds to milliseconds)."""
+        return {
+            "count": self.count,
+            "rate_per_s": self.rate(),
+            "mean": self.mean * scale,
+            "stddev": self.stddev * scale,
+            "p50": self.quantile(0.5) * scale,
+            "p99": self.quantile(0.99) * scale,
+            "max": self.max * scale if self.count else 0.0,
+        }
@@ -0,0 +1,78 @@
+from conflict_index import ConflictIndex
+from conflict_resolution import ConflictResolver
+
+KEY = ("USER", "gnb/0", "PRB_ALLOCATION")
+WINDOW = 10
+
+
+def decision(time, value):
+    return {"Time": time, "Control_Target_Type": KEY[0], "Control_Target_ID": KEY[1], "Parameter_Name": KEY[2],
+            "Parameter_Value": value}
+
+
+def run_cycles(resolver, sends, until):
+    """Detect once per second; sends maps a time to (xapp_id, value) decisions, skipped while the xApp is blocked.
+
+    Returns the times at which xApp #2 was blocked for KEY.
+    """
+    decisions = []
+    blocked_times = []
+    for now in range(until + 1):
+        for xapp_id, value in sends.get(now, ()):
+            if KEY not in resolver.blocked_keys(xapp_id):
+                decisions.append((xapp_id, decision(now, value)))
+        index = ConflictIndex()
+        for xapp_id, recent in decisions:
+            if recent["Time"] >= now - WINDOW:
+                index.add(xapp_id, recent)
+        resolver.resolve(index, now)
+        if KEY in resolver.blocked_keys(2):
+            blocked_times.append(now)
+    return blocked_times
+
+
+def test_block_held_while_winner_holds_unchanged_quota():
+    # xApp #1 resends its unchanged quota only every 30 s; its conflict with xApp #2 leaves the window at t=15
+    resolver = ConflictResolver(block_ttl=WINDOW, hold_ttl=30)
+    sends = {0: [(1, 10)], 5: [(2, 20)], 25: [(2, 20)], 30: [(1, 10)], 55: [(2, 20)], 60: [(1, 10)]}
+    blocked_times = run_cycles(resolver, sends, 70)
+    assert blocked_times == list(range(5, 71))
+
+
+def test_block_lifted_once_winner_stops_holding():
+    resolver = ConflictResolver(block_ttl=WINDOW, hold_ttl=30)
+    blocked_times = run_cycles(resolver, {0: [(1, 10)], 5: [(2, 20)]}, 60)
+    # xApp #1's decision leaves the window at t=11 and its hold ends 30 s later
+    assert blocked_times == list(range(5, 40))
+
+
+def test_default_hold_covers_refresh_every_hold_ttl_with_send_latency():
+    # xApp #1 refreshes exactly every hold_ttl seconds, its decisions logged 50 ms late; detection runs mid-second
+    resolver = ConflictResolver(block_ttl=WINDOW)
+    decisions = []
+    blocked_times = []
+    for second in range(int(3 * resolver.hold_ttl) + 1):
+        if second % resolver.hold_ttl == 0:
+            decisions.append((1, decision(second + 0.05, 10)))
+        if second % WINDOW == 5 and KEY not in resolver.blocked_keys(2):
+            decisions.append((2, decision(second + 0.05, 20)))
+        now = second + 0.5
+        index = ConflictIndex()
+        for xapp_id, recent in decisions:
+            if recent["Time"] >= now - WINDOW:
+                index.add(xapp_id, recent)
+        resolver.resolve(index, now)
+        if KEY in resolver.blocked_keys(2):
+            blocked_times.append(second)
+    assert blocked_times == list(range(5, int(3 * resolver.hold_ttl) + 1))
+
+
+def test_winner_is_not_blocked():
+    resolver = ConflictResolver(block_ttl=WINDOW)
+    index = ConflictIndex()
+    index.add(1, decision(0, 10))
+    index.add(2, decision(1, 20))
+    conflicts, new_blocks, lifted_blocks = resolver.resolve(index, 1)
+    assert conflicts[KEY][0] == 1
+    assert new_blocks == [(2, KEY)]
+    assert resolver.blocked_keys(1) == []
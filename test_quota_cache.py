@@ -0,0 +1,41 @@
+import random
+
+from quota_cache import QuotaCache
+
+
+def run_rounds(cache, period, rounds, send_latency):
+    """Plan a round every period seconds, late by up to 5 ms, and acknowledge it after send_latency seconds.
+
+    Returns the planning times of the rounds that sent the (unchanged) quota.
+    """
+    rng = random.Random(1)
+    sent = []
+    for round_index in range(rounds):
+        planned_time = round_index * period + rng.uniform(0.0001, 0.005)
+        if cache.should_send("gnb", 1, 0, 17, planned_time):
+            # As in the xApp: the fan-out sends after planning, and the cache is timed by the planning time
+            request = {"prb": 17, "planned_time": planned_time, "sent_time": planned_time + send_latency}
+            cache.acknowledge("gnb", 1, 0, request["prb"], request["planned_time"])
+            sent.append(planned_time)
+    return sent
+
+
+def test_refresh_every_round_when_period_equals_refresh_interval():
+    cache = QuotaCache(refresh_interval=10.0)
+    sent = run_rounds(cache, 10.0, 7, send_latency=0.05)
+    assert len(sent) == 7
+    assert cache.counters() == {"sent": 7, "suppressed": 0, "refreshed": 6}
+
+
+def test_unchanged_quota_suppressed_within_refresh_interval():
+    cache = QuotaCache(refresh_interval=10.0)
+    sent = run_rounds(cache, 2.5, 9, send_latency=0.05)
+    # Refreshed every fourth round, not deferred to every fifth by the send latency or round lateness
+    assert [round(planned_time) for planned_time in sent] == [0, 10, 20]
+
+
+def test_changed_quota_sent_at_once():
+    cache = QuotaCache(refresh_interval=10.0)
+    cache.acknowledge("gnb", 1, 0, 17, 0.0)
+    assert cache.should_send("gnb", 1, 0, 18, 1.0)
+    assert not cache.should_send("gnb", 1, 0, 17, 1.0)
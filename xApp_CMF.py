@@ -6,105 +6,297 @@ import argparse
 import signal
 import os
 import subprocess  # To run shell commands
-import csv
+import threading
 from lib.xAppBase import xAppBase
+from conflict_index import ConflictIndex
+from conflict_resolution import ConflictResolver, PriorityTable, POLICIES, default_hold_ttl, write_block_file
+from decision_tail import DecisionTailReader, DecisionWindow
+from compact_records import RECORD_TIME, decision_record, decode_key
+from instrumentation import Instrumentation, register_http_handlers
+from streaming_stats import StreamingStats
+# The watcher (ctypes), bus (socket), store (sqlite3) and sharded mode (multiprocessing) modules are imported
+# only when their mode is enabled, to shorten start-up
 
 
 class MyXapp(xAppBase):
-    def __init__(self, config, http_server_port, rmr_port):
+    def __init__(self, config, http_server_port, rmr_port, instrumentation=True, xapp_ids=(1, 2),
+                 resolution_policy="priority", priority_table=None, block_ttl=None, detection_workers=0,
+                 decision_store=None, hold_ttl=None, quota_refresh_interval=10.0, execution_period=10.0):
         super(MyXapp, self).__init__(config, http_server_port, rmr_port)
         self.start_time = time.time()
+        # Detection cycle and verdict latency histograms, served on http_server_port
+        self.instrumentation = Instrumentation(enabled=instrumentation)
+        register_http_handlers(self, self.instrumentation)
+        self.detection_stats = StreamingStats()
+        self.time_threshold = 10
+        self.decision_readers = {}
+        self.decision_windows = {}
+        # Decision store mode: recent decisions are an indexed range query instead of CSV windows
+        self.decision_store = None
+        if decision_store:
+            from decision_store import DecisionStore
+            self.decision_store = DecisionStore(decision_store)
+        # Sharded mode reads the decisions inserted after last_store_id, starting with the current window rather
+        # than the whole retained history
+        self.last_store_id = 0
+        if self.decision_store is not None:
+            self.last_store_id = self.decision_store.last_id_before(time.time() - self.time_threshold)
+        self.watcher = None
+        # Decisions are held as compact DecisionRecords; verdicts decode their keys back to names
+        # Decision bus mode: decisions are pushed into per-xApp windows, verdicts are published instead of files
+        self.bus = None
+        self.bus_lock = threading.Lock()
+        self.bus_windows = {}
+        # Set by every decision pushed over the bus, to wake the detector
+        self.bus_event = threading.Event()
+        # Conflicts are resolved per (target, parameter); blocks expire block_ttl seconds after the last conflict,
+        # or hold_ttl seconds after the winner's last decision for the target, whichever is later
+        self.xapp_ids = list(xapp_ids)
+        if hold_ttl is None:
+            hold_ttl = default_hold_ttl(quota_refresh_interval, self.time_threshold, execution_period)
+        self.resolver = ConflictResolver(resolution_policy, priority_table,
+                                         self.time_threshold if block_ttl is None else block_ttl, hold_ttl)
+        self.published_blocks = {}  # xapp_id -> keys in its last verdict
+        # Sharded mode: decisions are partitioned by target onto worker processes holding the windows
+        self.sharded_detector = None
+        if detection_workers > 0:
+            from sharded_detection import ShardedConflictDetector
+            self.sharded_detector = ShardedConflictDetector(detection_workers, self.time_threshold,
+                                                            resolution_policy, priority_table,
+                                                            self.resolver.block_ttl, self.resolver.hold_ttl)
 
-    def read_recent_decisions(self, file_path, time_threshold):
-        """Read recent decisions from a CSV file within the time threshold."""
-        recent_decisions = []
-        current_time = time.time()
+    def read_new_decisions(self, file_path):
+        """Read the decisions appended to a CSV file since the previous cycle."""
+        if file_path not in self.decision_readers:
+            self.decision_readers[file_path] = DecisionTailReader(file_path)
+        try:
+            new_decisions = self.decision_readers[file_path].read_new_records()
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+            return []
+        if new_decisions:
+            current_datetime = datetime.datetime.now()
+            print("{} Read {} new control decisions from path: {}".format(
+                current_datetime.strftime("%H:%M:%S"), len(new_decisions), file_path))
+        return new_decisions
 
-        if not os.path.exists(file_path):
-            return recent_decisions
+    def query_recent_decisions(self, xapp_id, time_threshold):
+        """Recent decisions of an xApp from the decision store, an index range scan on (xapp_id, time)."""
+        try:
+            return self.decision_store.recent_records(xapp_id, time.time() - time_threshold)
+        except Exception as e:
+            print(f"Error querying the decision store: {e}")
+            return []
 
+    def read_store_decisions(self):
+        """Decisions inserted into the store since the previous cycle, by xApp (sharded mode)."""
         try:
-            with open(file_path, "r") as f:
-                current_datetime = datetime.datetime.now()
-                print("{} Reading recent control decisions from path: {}, time threshold: {} seconds".format(
-                    current_datetime.strftime("%H:%M:%S"), file_path, time_threshold))
-                reader = csv.DictReader(f)
-                for row in reader:
-                    decision_time = float(row["Time"])
-                    if current_time - decision_time <= time_threshold:
-                        recent_decisions.append({
-                            "Time": decision_time,
-                            "Datetime": row["Datetime"],
-                            "Control_Target_Type": row["Control_Target_Type"],
-                            "Control_Target_ID": row["Control_Target_ID"],
-                            "Parameter_Name": row["Parameter_Name"],
-                            "Parameter_Value": float(row["Parameter_Value"]),
-                        })
+            self.last_store_id, new_decisions = self.decision_store.new_records(self.last_store_id)
         except Exception as e:
-            print(f"Error reading {file_path}: {e}")
+            print(f"Error querying the decision store: {e}")
+            return {}
+        return new_decisions
 
-        return recent_decisions
-
-    def detect_and_handle_conflicts(self, recent_decisions_xapp1, recent_decisions_xapp2, block_file_path_xapp1,
-                                    block_file_path_xapp2):
-        """Detect conflicts and create block files."""
-        conflicts = []
-
-        for dec1 in recent_decisions_xapp1:
-            for dec2 in recent_decisions_xapp2:
-                if (dec1["Control_Target_Type"] == dec2["Control_Target_Type"] and
-                        dec1["Control_Target_ID"] == dec2["Control_Target_ID"] and
-                        dec1["Parameter_Name"] == dec2["Parameter_Name"] and
-                        dec1["Parameter_Value"] != dec2["Parameter_Value"]):
-                    conflicts.append((dec1, dec2))
-
-        for conflict in conflicts:
-            dec1, dec2 = conflict
-            print(
-    	        f"Conflict for {dec1['Control_Target_Type']} {dec1['Control_Target_ID']} "
-  	        f"for parameter {dec1['Parameter_Name']} and values: {dec1['Parameter_Value']} "
-               f"and {dec2['Parameter_Value']}"
-)
-
-            # Create block file for non-prioritized xApp #2 once conflict is detected
-            if not os.path.exists(block_file_path_xapp2):
-                open(block_file_path_xapp2, "w").close()
-                print(f"xApp #3: Block file created for xApp #2")
+    def read_recent_decisions(self, file_path, time_threshold):
+        """Read recent decisions from a CSV file within the time threshold.
 
-            else:
-                print(f"xApp #3: Block file xApp #2 already exists")
+        Only rows appended since the previous cycle are parsed; older decisions are kept in a per-file sliding
+        window.
+        """
+        if file_path not in self.decision_windows:
+            self.decision_windows[file_path] = DecisionWindow(time_threshold, RECORD_TIME)
+        window = self.decision_windows[file_path]
+        window.time_threshold = time_threshold
+        window.extend(self.read_new_decisions(file_path))
+        return window.recent(time.time())
+
+    def on_bus_decision(self, message):
+        record = decision_record(message)
+        if self.sharded_detector is not None:
+            self.sharded_detector.add(message["xapp_id"], [record])
+            self.bus_event.set()
+            return
+        with self.bus_lock:
+            xapp_id = message["xapp_id"]
+            if xapp_id not in self.bus_windows:
+                self.bus_windows[xapp_id] = DecisionWindow(self.time_threshold, RECORD_TIME)
+            self.bus_windows[xapp_id].extend([record])
+        self.bus_event.set()
+
+    def recent_bus_decisions(self, xapp_id):
+        with self.bus_lock:
+            if xapp_id not in self.bus_windows:
+                return []
+            return self.bus_windows[xapp_id].recent(time.time())
+
+    def block_file_path(self, xapp_id):
+        return os.path.join(os.getcwd(), "xapp_{}.block".format(xapp_id))
+
+    def blocked_keys(self, xapp_id):
+        """Return the decoded (Control_Target_Type, Control_Target_ID, Parameter_Name) keys an xApp is blocked for."""
+        if self.sharded_detector is not None:
+            keys = self.sharded_detector.blocked_keys(xapp_id)
+        else:
+            keys = self.resolver.blocked_keys(xapp_id)
+        return [decode_key(key) for key in keys]
+
+    def publish_verdict(self, xapp_id, keys):
+        """Send an xApp the (target, parameter) keys it is blocked for; no keys lift its blocks."""
+        if xapp_id in self.published_blocks and self.published_blocks[xapp_id] == keys:
+            return
+        self.published_blocks[xapp_id] = keys
+        if self.bus is not None:
+            self.bus.publish({"topic": "verdict", "xapp_id": xapp_id, "blocked": bool(keys),
+                              "targets": [list(key) for key in keys], "retain": True})
+            print(f"xApp #3: Verdict published for xApp #{xapp_id}, blocked for {len(keys)} targets")
+            return
+
+        block_file_path = self.block_file_path(xapp_id)
+        if keys:
+            write_block_file(block_file_path, keys)
+            print(f"xApp #3: Block file for xApp #{xapp_id} updated, blocked for {len(keys)} targets")
+        elif os.path.exists(block_file_path):
+            os.remove(block_file_path)
+            print(f"xApp #3: Block file for xApp #{xapp_id} removed, conflicts cleared")
+
+    def detect_and_handle_conflicts(self, recent_decisions_by_xapp):
+        """Detect conflicts between the recent decisions of all xApps, resolve them and publish the verdicts."""
+        conflict_index = ConflictIndex()
+        for xapp_id, recent_decisions in recent_decisions_by_xapp.items():
+            conflict_index.add_records(xapp_id, recent_decisions)
+        conflicts, new_blocks, lifted_blocks = self.resolver.resolve(conflict_index, time.time())
+        latest_decision_time = max((conflict_index.latest_times[key] for _, key in new_blocks), default=None)
+        self.handle_verdicts(conflicts, new_blocks, lifted_blocks, latest_decision_time)
+        return conflicts
+
+    def detect_and_handle_sharded_conflicts(self):
+        """Run one detection cycle on the shard workers, which hold the recent decisions, and publish the verdicts."""
+        conflicts, new_blocks, lifted_blocks, latest_decision_time = self.sharded_detector.resolve(time.time())
+        self.instrumentation.record_duration("shard_detection", max(self.sharded_detector.worker_times) * 1e9)
+        self.handle_verdicts(conflicts, new_blocks, lifted_blocks, latest_decision_time)
+        return conflicts
+
+    def handle_verdicts(self, conflicts, new_blocks, lifted_blocks, latest_decision_time):
+        for key, (winner, values_by_xapp) in conflicts.items():
+            target_type, target_id, parameter_name = decode_key(key)
+            values = ", ".join(f"xApp #{xapp_id}: {sorted(values_by_xapp[xapp_id])}"
+                               for xapp_id in sorted(values_by_xapp))
+            print(f"Conflict for {target_type} {target_id} for parameter {parameter_name} and values: {values}; "
+                  f"xApp #{winner} keeps control ({self.resolver.policy_name} policy)")
+        for xapp_id, key in lifted_blocks:
+            target_type, target_id, parameter_name = decode_key(key)
+            print(f"xApp #3: Block of xApp #{xapp_id} for {target_type} {target_id} {parameter_name} lifted")
+
+        for xapp_id in sorted(set(xapp_id for xapp_id, _ in new_blocks + lifted_blocks)):
+            self.publish_verdict(xapp_id, self.blocked_keys(xapp_id))
+
+        if new_blocks:
+            # Detection latency: from the newest conflicting decision being written to the block verdict
+            detection_latency = time.time() - latest_decision_time
+            self.instrumentation.record_duration("cmf_verdict", detection_latency * 1e9)
+            self.detection_stats.add(detection_latency)
+            print(f"xApp #3: Detection latency from decision write to block verdict: "
+                  f"{detection_latency * 1000:.1f} ms (mean {self.detection_stats.mean * 1000:.1f} ms, "
+                  f"p99 {self.detection_stats.quantile(0.99) * 1000:.1f} ms over "
+                  f"{self.detection_stats.count} verdicts)")
 
     # Mark the function as xApp start function using xAppBase.start_function decorator.
     # It is required to start the internal msg receive loop.
     @xAppBase.start_function
-    def start(self):
+    def start(self, event_driven=False, bus_path=''):
         # configuration of CD/CR - need to align with xApp #1/#2 logic
         print("Starting CMF xApp - setting up file paths and time threshold")
-        xapp1_decision_file_path = os.path.join(os.getcwd(), "xapp_decisions_1.csv")
-        xapp2_decision_file_path = os.path.join(os.getcwd(), "xapp_decisions_2.csv")
-        xapp1_block_file_path = os.path.join(os.getcwd(), "xapp_1.block")
-        xapp2_block_file_path = os.path.join(os.getcwd(), "xapp_2.block")
-        time_threshold = 10
+        decision_file_paths = {xapp_id: os.path.join(os.getcwd(), "xapp_decisions_{}.csv".format(xapp_id))
+                               for xapp_id in self.xapp_ids}
+        time_threshold = self.time_threshold
 
         current_datetime = datetime.datetime.now()
-        print("{} xApp #1 decision file path: {}, xApp #2 decision file path: {}, xApp #1 block file path: {}, "
-              "xApp #2 block file path: {}".format(current_datetime.strftime("%H:%M:%S"),
-                                                   xapp1_decision_file_path, xapp1_decision_file_path,
-                                                   xapp1_block_file_path, xapp2_block_file_path))
+        for xapp_id, decision_file_path in decision_file_paths.items():
+            print("{} xApp #{} decision file path: {}, block file path: {}".format(
+                current_datetime.strftime("%H:%M:%S"), xapp_id, decision_file_path, self.block_file_path(xapp_id)))
+        print(f"Conflict resolution policy: {self.resolver.policy_name}, blocks expire "
+              f"{self.resolver.block_ttl} s after the last conflict and {self.resolver.hold_ttl} s after the winner's "
+              f"last decision")
+
+        if self.sharded_detector is not None:
+            self.sharded_detector.start()
+            print(f"CMF sharded mode: {self.sharded_detector.worker_count} detection workers")
+
+        # In event-driven mode wake up as soon as a decision file is written; the polling interval still bounds
+        # the wait so that old decisions are evicted from the window
+        self.watcher = None
+        if bus_path:
+            from decision_bus import DecisionBusServer
+            # Decisions pushed over the bus wake the detector directly, through bus_event
+            self.bus = DecisionBusServer(bus_path)
+            self.bus.start()
+            self.bus.subscribe(["decision"], self.on_bus_decision)
+            print(f"CMF decision bus mode: serving on {bus_path}")
+        elif event_driven:
+            from file_watcher import DecisionWatcher
+            if self.decision_store is not None:
+                # Inserts go to the write-ahead log first
+                watched_paths = [self.decision_store.file_path, self.decision_store.file_path + "-wal"]
+            else:
+                watched_paths = list(decision_file_paths.values())
+            self.watcher = DecisionWatcher(watched_paths)
+            print("CMF event-driven mode: {}".format(
+                "watching decision files" if self.watcher.event_driven else "no file watcher, polling"))
+
+        # Clear block files or verdicts left by a previous CMF run, which would otherwise keep xApps blocked
+        for xapp_id in self.xapp_ids:
+            self.publish_verdict(xapp_id, self.blocked_keys(xapp_id))
 
         # detect and resolve conflicts
         while self.running:
-            # Read recent decisions from xApp #1 and #2
+            # Read recent decisions from all xApps
             print("CMF work in progress - next detection cycle, reading recent control decisions")
-            recent_decisions_xapp1 = self.read_recent_decisions(xapp1_decision_file_path, time_threshold)
-            recent_decisions_xapp2 = self.read_recent_decisions(xapp2_decision_file_path, time_threshold)
+            cycle_start_ns = self.instrumentation.now()
+            if self.sharded_detector is not None:
+                # Bus decisions are forwarded to the shards as they arrive
+                if self.bus is None and self.decision_store is not None:
+                    for xapp_id, new_decisions in self.read_store_decisions().items():
+                        self.sharded_detector.add(xapp_id, new_decisions)
+                elif self.bus is None:
+                    for xapp_id, decision_file_path in decision_file_paths.items():
+                        self.sharded_detector.add(xapp_id, self.read_new_decisions(decision_file_path))
+                print("CMF work in progress - detecting conflicts on the shard workers")
+                self.detect_and_handle_sharded_conflicts()
+            else:
+                if self.bus is not None:
+                    with self.bus_lock:
+                        bus_xapp_ids = list(self.bus_windows)
+                    recent_decisions_by_xapp = {xapp_id: self.recent_bus_decisions(xapp_id)
+                                                for xapp_id in bus_xapp_ids}
+                elif self.decision_store is not None:
+                    recent_decisions_by_xapp = {xapp_id: self.query_recent_decisions(xapp_id, time_threshold)
+                                                for xapp_id in self.xapp_ids}
+                else:
+                    recent_decisions_by_xapp = {
+                        xapp_id: self.read_recent_decisions(decision_file_path, time_threshold)
+                        for xapp_id, decision_file_path in decision_file_paths.items()}
+
+                # Detect and resolve conflicts
+                print("CMF work in progress - detecting conflicts between recent decisions")
+                self.detect_and_handle_conflicts(recent_decisions_by_xapp)
+            self.instrumentation.record("detection_cycle", cycle_start_ns)
 
-            # Detect and handle conflicts
-            print("CMF work in progress - detecting conflicts between recent decisions")
-            self.detect_and_handle_conflicts(recent_decisions_xapp1, recent_decisions_xapp2, xapp1_block_file_path,
-                                             xapp2_block_file_path)
+            if self.watcher is not None:
+                self.watcher.wait(1)
+            elif self.bus is not None:
+                self.bus_event.wait(1)
+                self.bus_event.clear()
+            else:
+                time.sleep(1)  # Polling interval
 
-            time.sleep(1)  # Polling interval
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.bus is not None:
+            self.bus.stop()
+        if self.sharded_detector is not None:
+            self.sharded_detector.stop()
+        if self.decision_store is not None:
+            self.decision_store.close()
 
 
 if __name__ == '__main__':
@@ -114,6 +306,31 @@ if __name__ == '__main__':
     parser.add_argument("--http_server_port", type=int, default=8093, help="HTTP server listen port")
     parser.add_argument("--rmr_port", type=int, default=4563, help="RMR port")
     parser.add_argument("--ran_func_id", type=int, default=3, help="E2SM RC RAN function ID")
+    parser.add_argument("--event_driven", action="store_true",
+                        help="Wake on decision file writes instead of polling every second")
+    parser.add_argument("--bus_path", type=str, default='',
+                        help="Serve the decision bus on this socket path instead of using CSV and block files")
+    parser.add_argument("--no_instrumentation", action="store_true",
+                        help="Start with latency instrumentation disabled (can be enabled over HTTP)")
+    parser.add_argument("--xapp_ids", type=str, default='1,2',
+                        help="Comma-separated IDs (app_mode) of the xApps whose decision files are read")
+    parser.add_argument("--resolution_policy", type=str, default='priority', choices=sorted(POLICIES),
+                        help="Which xApp keeps control of a conflicting target")
+    parser.add_argument("--priority_table", type=str, default='',
+                        help="JSON file with xApp priorities (default: lower xApp ID first)")
+    parser.add_argument("--detection_workers", type=int, default=0,
+                        help="Worker processes for sharded conflict detection; 0 detects in the CMF process")
+    parser.add_argument("--decision_store", type=str, default='',
+                        help="Read decisions from this SQLite decision store instead of xapp_decisions_N.csv")
+    parser.add_argument("--block_ttl", type=float, default=None,
+                        help="Seconds a block lasts after its conflict was last seen (default: the 10 s window)")
+    parser.add_argument("--hold_ttl", type=float, default=None,
+                        help="Seconds the winner holds a target after its last decision left the window (default: "
+                             "--quota_refresh_interval plus a margin of the 10 s window and one --execution_period)")
+    parser.add_argument("--quota_refresh_interval", type=float, default=10.0,
+                        help="The xApps' --quota_refresh_interval, for the default --hold_ttl")
+    parser.add_argument("--execution_period", type=float, default=10.0,
+                        help="The xApps' --execution_period, for the default --hold_ttl")
 
     args = parser.parse_args()
     config = args.config
@@ -121,7 +338,11 @@ if __name__ == '__main__':
 
     # Create MyXapp.
     print("Starting CMF xApp - creating myXapp object and setting ran func ID")
-    myXapp = MyXapp(config, args.http_server_port, args.rmr_port)
+    priority_table = PriorityTable.from_json(args.priority_table) if args.priority_table else None
+    myXapp = MyXapp(config, args.http_server_port, args.rmr_port, not args.no_instrumentation,
+                    [int(xapp_id) for xapp_id in args.xapp_ids.split(",")], args.resolution_policy, priority_table,
+                    args.block_ttl, args.detection_workers, args.decision_store, args.hold_ttl,
+                    args.quota_refresh_interval, args.execution_period)
     myXapp.e2sm_rc.set_ran_func_id(ran_func_id)
 
     # Connect exit signals.
@@ -132,5 +353,5 @@ if __name__ == '__main__':
 
     # Start xApp.
     print("Starting CMF xApp - calling start() function")
-    myXapp.start()
+    myXapp.start(args.event_driven, args.bus_path)
 
@@ -5,24 +5,107 @@ import datetime
 import argparse
 import signal
 import logging
-import requests
-import math
 import csv
 import os
+import json
+import threading
+from fast_start import process_start_time, save_snapshot, load_snapshot
 from lib.xAppBase import xAppBase
-from central_controller import CentralController
+from decision_bus import DecisionBusClient
+from measurement_logger import MeasurementLogger
+from instrumentation import Instrumentation, register_http_handlers
+from streaming_stats import StreamingStats
+from control_fanout import ControlFanout
+from quota_cache import QuotaCache
+from allocation_engine import allocate, preload_numpy
+from execution_scheduler import ExecutionScheduler
+from conflict_resolution import read_block_file
+from compact_records import MeasurementBatch, metric_names
+# asyncio and sqlite3 are imported only when the async runtime or the decision store is used, and NumPy on a
+# background thread, to shorten start-up
 
 class MyXapp(xAppBase):
-    def __init__(self, config, http_server_port, rmr_port, controller, xapp_id, flask_server_url, app_mode):
+    def __init__(self, config, http_server_port, rmr_port, controller, xapp_id, flask_server_url, app_mode,
+                 bus_path=None, log_format='csv', quiet_metrics=False, instrumentation=True, metrics_window=60.0,
+                 topology=None, control_workers=16, max_in_flight_per_node=4, quota_refresh_interval=10.0,
+                 execution_period=10.0, execution_phase=None, trigger_on_ue_change=False, async_runtime=False,
+                 stage_queue_size=100, decision_store=None, fast_start=False, snapshot_max_age=300.0, xapp_count=2):
+        preload_numpy()
         super(MyXapp, self).__init__(config, http_server_port, rmr_port)
         self.controller = controller
         self.xapp_id = xapp_id
         self.start_time = time.time()
         self.processed_messages = 0
-        self.latencies = []
+        # Round latency statistics in constant memory; the rate covers the last metrics_window seconds
+        self.round_stats = StreamingStats(rate_window=metrics_window)
         self.flask_server_url = flask_server_url
         self.latestUeCount = 0
+        self.latestUeCounts = {}
+        # Indications update the UE counts on the RMR thread while rounds copy them into snapshots
+        self.ue_counts_lock = threading.Lock()
         self.app_mode = app_mode
+        # Control rounds run every execution_period seconds at this xApp's phase; by default the xapp_count xApps
+        # are spread evenly over the period, i.e. xApp #1 at 0 s and xApp #2 at 5 s of every 10 s, as before
+        if execution_phase is None:
+            if not 1 <= app_mode <= xapp_count:
+                raise ValueError(f"xApp mode {app_mode} has no default execution phase among {xapp_count} xApps; "
+                                 f"set the execution phase or the xApp count")
+            execution_phase = (app_mode - 1) * execution_period / xapp_count
+        self.scheduler = ExecutionScheduler(execution_period, execution_phase)
+        self.trigger_on_ue_change = trigger_on_ue_change
+        # Hot-path latency histograms, served on http_server_port
+        self.instrumentation = Instrumentation(enabled=instrumentation)
+        self.last_ue_count_update_ns = 0
+        self.last_decision_published_ns = 0
+        register_http_handlers(self, self.instrumentation)
+        # Without a decision bus, decisions go to xapp_decisions_N.csv and verdicts come from xapp_N.block.
+        # CMF verdicts block (target type, target ID, parameter) keys; an empty set blocks every target
+        self.blocked = False
+        self.blocked_targets = set()
+        self.verdict_stale = False
+        self.bus = None
+        # Decisions are also kept in an indexed SQLite store, replacing xapp_decisions_N.csv
+        self.decision_store = None
+        if decision_store:
+            from decision_store import DecisionStore
+            self.decision_store = DecisionStore(decision_store)
+        if bus_path:
+            self.bus = DecisionBusClient(bus_path, ["verdict"], self.on_verdict, on_disconnect=self.on_bus_disconnect)
+        # KPM measurements are logged from a background thread, off the RMR receive path
+        self.quiet_metrics = quiet_metrics
+        log_file_path = {'csv': 'xapp_timing_1.csv', 'binary': 'xapp_timing_1.bin', 'sqlite': 'xapp_timing_1.db'}[log_format]
+        self.measurement_logger = MeasurementLogger(log_file_path, log_format)
+        self.measurement_logger.start()
+        # E2 nodes x slices x UEs to control; defaults to a single node with the slices below
+        self.topology = topology
+        self.control_fanout = ControlFanout(control_workers, max_in_flight_per_node)
+        # Only changed PRB quotas are sent, unchanged ones are resent every quota_refresh_interval seconds
+        self.quota_cache = QuotaCache(quota_refresh_interval)
+        # asyncio runtime: indication decoding, allocation, control dispatch and logging run as separate tasks
+        # joined by bounded queues; queue depths and lags are served with the latency metrics
+        self.pipeline = None
+        if async_runtime:
+            from async_runtime import StagePipeline
+            self.pipeline = StagePipeline(["decode", "allocate", "dispatch", "log"], stage_queue_size,
+                                          self.instrumentation)
+        # Fast start: UE counts and sent quotas are restored from the last snapshot, so the first round needs
+        # neither a KPM indication nor resending quotas the E2 nodes still hold, and the KPM subscription is
+        # set up while waiting for the first slot
+        self.fast_start = fast_start
+        self.snapshot_path = f"xapp_{app_mode}_snapshot.json"
+        if fast_start:
+            snapshot = load_snapshot(self.snapshot_path, snapshot_max_age)
+            if snapshot is not None:
+                ue_counts, quotas = snapshot
+                self.latestUeCounts = ue_counts
+                self.latestUeCount = sum(ue_counts.values())
+                self.quota_cache.restore(quotas)
+                print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Restored {self.latestUeCount} UEs and "
+                      f"{len(quotas)} PRB quotas from {self.snapshot_path}")
+        self.process_start_time = process_start_time()
+        # With restored quotas the first rounds may send nothing, so the first completed round is reported too
+        self.first_round_time = None
+        self.first_control_time = None
         
         
        # Latency Log Header
@@ -40,72 +123,75 @@ class MyXapp(xAppBase):
         ]
 
     def my_subscription_callback(self, e2_agent_id, subscription_id, indication_hdr, indication_msg, kpm_report_style, ue_id):
+        # Monotonic receipt time; the logged latency covers decoding and processing of the indication
+        start_time = time.perf_counter()
+        receipt_ns = self.instrumentation.now()
         indication_hdr = self.e2sm_kpm.extract_hdr_info(indication_hdr)
+        hdr_decoded_ns = self.instrumentation.now()
+        self.instrumentation.record("hdr_decode", receipt_ns, hdr_decoded_ns)
         meas_data = self.e2sm_kpm.extract_meas_data(indication_msg)
-        start_time = time.time()  # Record start time
+        self.instrumentation.record("meas_decode", hdr_decoded_ns)
 
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Data Monitoring:")
-        print("  E2SM_KPM RIC Indication Content:")
-        print("  -ColletStartTime: ", indication_hdr['colletStartTime'])
-        print("  -Measurements Data:")
+        if not self.quiet_metrics:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Data Monitoring:")
+            print("  E2SM_KPM RIC Indication Content:")
+            print("  -ColletStartTime: ", indication_hdr['colletStartTime'])
+            print("  -Measurements Data:")
 
-        # Process UE measurement data
+        # Process UE measurement data into one batch of parallel arrays, without a row per sample
+        samples = MeasurementBatch()
+        metric_code = metric_names.code
         for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
-            print("  --UE_id: {}".format(ue_id))
-            granulPeriod = ue_meas_data.get("granulPeriod", None)
-            if granulPeriod is not None:
-                print("  ---granulPeriod: {}".format(granulPeriod))
+            if not self.quiet_metrics:
+                print("  --UE_id: {}".format(ue_id))
+                granulPeriod = ue_meas_data.get("granulPeriod", None)
+                if granulPeriod is not None:
+                    print("  ---granulPeriod: {}".format(granulPeriod))
 
             for metric_name, values in ue_meas_data["measData"].items():
-                print("  ---Metric: {}, Value: {:.1f} [MB]".format(metric_name, sum(values) / 8 / 1000))
+                if not self.quiet_metrics:
+                    print("  ---Metric: {}, Value: {:.1f} [MB]".format(metric_name, sum(values) / 8 / 1000))
+                # Convert bytes to MB
+                samples.append(ue_id, metric_code(metric_name),
+                               values[0] / 8 / 1000 if isinstance(values, list) else values)
 
-        # Log the latency to the CSV file
-        latency = time.time() - start_time  # Time difference in seconds
+        # Log the latency with each measurement
+        latency = time.perf_counter() - start_time  # Time difference in seconds
 
-        # Prepare data for CSV
-        log_file_path = 'xapp_timing_1.csv'  # Path to the latency log file
-        csv_headers = ['Time', 'UE_id', 'Metric', 'Value', 'latency']
-        
-        # Open the CSV file in append mode and write data
-        with open(log_file_path, 'a', newline='') as csv_file:
-            csv_writer = csv.writer(csv_file)
-
-            # Write headers only once (if file is empty)
-            if csv_file.tell() == 0:
-                csv_writer.writerow(csv_headers)
-
-            # Process UE-level measurement data
-            for ue_id, ue_meas_data in meas_data["ueMeasData"].items():
-                print("--UE_id: {}".format(ue_id))
-                #granulPeriod = ue_meas_data.get("granulPeriod", None)
-                #if granulPeriod is not None:
-                  #  print("---granulPeriod: {}".format(granulPeriod))
-
-                # Log each metric and value for the UE in the CSV
-                for metric_name, value in ue_meas_data["measData"].items():
-                    print("---Metric: {}, Value: {}".format(metric_name, value))
-                    # Append row to the CSV file
-                    csv_writer.writerow([
-                        indication_hdr['colletStartTime'],
-                        ue_id,
-                        metric_name,
-                        value[0] / 8 / 1000 if isinstance(value, list) else value,  # Convert bytes to MB
-                        latency  # Log the latency for each trigger
-                    ])
-
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Metrics logged to {log_file_path}")
+        if self.pipeline is not None:
+            self.pipeline.submit("log", ("measurements", indication_hdr['colletStartTime'], latency, samples))
+        else:
+            self.log_measurements(indication_hdr['colletStartTime'], latency, samples)
 
         # Count UEs and update latest UE count held in xApp logic
+        ue_count_update_ns = self.instrumentation.now()
         ue_meas_data_items = meas_data["ueMeasData"].items()
         ueCount = len(ue_meas_data_items)
-        self.updateLatestUeCount(ueCount)
-
-    def updateLatestUeCount(self, latestUeCount):
-        self.latestUeCount = latestUeCount
-
-    def getLatestUeCount(self):
-        # it shall return 2 or 3 based on current total number of UEs in all slices
-        return self.latestUeCount
+        self.updateLatestUeCount(ueCount, e2_agent_id)
+        self.last_ue_count_update_ns = self.instrumentation.now()
+        self.instrumentation.record("ue_count_update", ue_count_update_ns, self.last_ue_count_update_ns)
+        self.instrumentation.record("indication_total", receipt_ns, self.last_ue_count_update_ns)
+
+    def log_measurements(self, collet_start_time, latency, samples):
+        # Rows are written to the log file by the background measurement logger
+        if not self.measurement_logger.log_indication(collet_start_time, latency, samples):
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Measurement log queue full, "
+                  f"{self.measurement_logger.dropped_indications} indications dropped")
+
+    def updateLatestUeCount(self, latestUeCount, e2_node_id=None):
+        with self.ue_counts_lock:
+            previousUeCount = self.latestUeCounts.get(e2_node_id)
+            self.latestUeCounts[e2_node_id] = latestUeCount
+            self.latestUeCount = sum(self.latestUeCounts.values())
+        if self.trigger_on_ue_change and previousUeCount is not None and previousUeCount != latestUeCount:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: UE count changed from {previousUeCount} to {latestUeCount}, triggering a round")
+            self.scheduler.trigger()
+
+    def getLatestUeCount(self, e2_node_id=None):
+        # Without e2_node_id, return the total number of UEs in all slices of all E2 nodes
+        if e2_node_id is None:
+            return self.latestUeCount
+        return self.latestUeCounts.get(e2_node_id, 0)
 
     def setup_subscription(self, e2_node_id):
         print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Setting up subscription for xApp...")
@@ -117,8 +203,7 @@ class MyXapp(xAppBase):
         granul_period = 1000
 
         # use always the same subscription callback, but bind kpm_report_style parameter
-        subscription_callback = lambda agent, sub, hdr, msg: self.my_subscription_callback(agent, sub, hdr, msg,
-                                                                                           kpm_report_style, None)
+        subscription_callback = self.subscription_callback(kpm_report_style)
 
         # currently only dummy condition that is always satisfied, useful to get IDs of all connected UEs
         # example matching UE condition: ul-rSRP < 1000
@@ -131,147 +216,415 @@ class MyXapp(xAppBase):
         self.e2sm_kpm.subscribe_report_service_style_4(e2_node_id, report_period, matchingUeConds, metric_names,
                                                        granul_period, subscription_callback)
 
-    def process(self, totalSliceCount, totalPrbCount, totalUeCount, ueCountSliceA):
-        # Check if xApp is blocked from performing control decisions due to CM measures
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Starting processing of PRB allocations.")
+    def subscription_callback(self, kpm_report_style):
+        if self.pipeline is not None:
+            # The RMR receive thread only hands the raw indication to the decode stage
+            return lambda agent, sub, hdr, msg: self.pipeline.submit("decode", (agent, sub, hdr, msg,
+                                                                                kpm_report_style, None))
+        return lambda agent, sub, hdr, msg: self.my_subscription_callback(agent, sub, hdr, msg, kpm_report_style,
+                                                                          None)
+
+    def on_verdict(self, message):
+        # CMF verdicts are pushed by the decision bus
+        if message.get("xapp_id") != self.app_mode:
+            return
+        self.blocked_targets = set(tuple(target) for target in message.get("targets", []))
+        self.blocked = bool(message.get("blocked"))
+        self.verdict_stale = False
+        # Time from the last decision this xApp published to the CMF verdict arriving
+        self.instrumentation.record("cmf_verdict", self.last_decision_published_ns)
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: CMF verdict received, blocked: {self.blocked}, "
+              f"targets: {len(self.blocked_targets) if self.blocked_targets else 'all' if self.blocked else 0}")
+
+    def on_bus_disconnect(self):
+        # Verdicts may be missed until the bus is back, so stay blocked until the CMF sends a fresh one
+        self.verdict_stale = True
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Decision bus lost, blocked until a fresh CMF verdict")
+
+    def verdict_targets(self):
+        """Return the (target type, target ID, parameter) keys blocked by the CMF, None if not blocked.
+
+        An empty set means every target is blocked.
+        """
+        if self.bus is not None:
+            if self.verdict_stale:
+                return set()
+            return self.blocked_targets if self.blocked else None
         block_file_name = 'xapp_{}.block'.format(self.app_mode)
         block_file_path = os.path.join(os.getcwd(), block_file_name)
-        if os.path.exists(block_file_path):
-            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Block file detected. Ceasing control decisions.")
+        return read_block_file(block_file_path)
+
+    def is_blocked(self):
+        return self.verdict_targets() is not None
+
+    def log_control_decision(self, current_time, current_datetime, control_target_type, control_target_id,
+                             parameter_name, parameter_value):
+        """Publish a control decision to the CMF, via the decision bus, the decision store or xapp_decisions_N.csv."""
+        decision = {
+            "Time": current_time,
+            "Datetime": current_datetime.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "Control_Target_Type": control_target_type,
+            "Control_Target_ID": str(control_target_id),
+            "Parameter_Name": parameter_name,
+            "Parameter_Value": float(parameter_value),
+        }
+        if self.decision_store is not None:
+            # Inserted in batches; log_round flushes at the end of every round
+            self.decision_store.add_decision(self.app_mode, decision)
+        if self.bus is not None:
+            self.bus.publish(dict(decision, topic="decision", xapp_id=self.app_mode))
+            self.last_decision_published_ns = self.instrumentation.now()
+            return
+        if self.decision_store is not None:
             return
 
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Block file not detected. Proceeding to process PRB allocations.")
+        decision_file_path = os.path.join(os.getcwd(), 'xapp_decisions_{}.csv'.format(self.app_mode))
+        with open(decision_file_path, 'a', newline='') as csv_file:
+            csv_writer = csv.DictWriter(csv_file, fieldnames=list(decision))
+            if csv_file.tell() == 0:
+                csv_writer.writeheader()
+            csv_writer.writerow(decision)
+
+    def sliceWeights(self, ueCountsPerSlice):
+        # xApp #1 shares PRBs in proportion to the UE count of each slice, so Slice A gains PRBs as UEs join it;
+        # xApp #2 shares PRBs equally among slices, regardless of their UE count
         if self.app_mode == 1:
-            prbAllocations_xApp = self.process_xApp_1(totalSliceCount=totalSliceCount,
-                                                      totalPrbCount=totalPrbCount,
-                                                      ueCountSliceA=ueCountSliceA,
-                                                      totalUeCount=totalUeCount)
-        elif self.app_mode == 2:
-            prbAllocations_xApp = self.process_xApp_2(totalSliceCount=totalSliceCount,
-                                                      totalPrbCount=totalPrbCount)
-
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: PRB Allocations: {prbAllocations_xApp}")
-        # Continue with PRB control based on calculated allocations
-        # (The rest of the process method code remains unchanged)
-
-
-        # Continue with PRB control based on calculated allocations
-        # 1) for Slice A
-        prbAllocationSliceA = prbAllocations_xApp[0]
-        ueAllocationsSliceA = self.computeAllocationsForSlice(prbAllocation=prbAllocationSliceA,
-                                                              ueCountSlice=ueCountSliceA)
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {prbAllocationSliceA} PRBs allocated to Slice A, split among UEs: {ueAllocationsSliceA}")
-        for i, prbAllocationForUe in enumerate(ueAllocationsSliceA):
-            ue = self.uesSliceA[i]
-            ue_id = ue['id']
-            sst = ue['sst']
-            sd = ue['sd']
-            current_time = time.time()
-            current_datetime = datetime.datetime.now()
-            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Sending RIC Control Request to E2 node ID: {e2_node_id} slice: {sd} for UE ID: {ue_id}, PRB: {prbAllocationForUe}")
-            # print("{} [{}] Send RIC Control Request to E2 node ID: {} slice: {} for UE ID: {}, PRB: {}".format(
-            #    current_datetime.strftime("%H:%M:%S"), self.xapp_id, e2_node_id, sd, ue_id, prbAllocationForUe))
-
-            # Log the message with the CentralController
-            self.controller.log_message(self.xapp_id, e2_node_id, ue_id, prbAllocationForUe, prbAllocationForUe,
-                                        current_time)
-            # Execute the RAN control
-            self.e2sm_rc.control_slice_level_prb_quota(e2_node_id, ue_id, min_prb_ratio=prbAllocationForUe,
-                                                       max_prb_ratio=prbAllocationForUe, dedicated_prb_ratio=100,
-                                                       ack_request=1, sst=sst, sd=sd)
-            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Sent RIC Control Request to E2 node ID: {e2_node_id} slice: {sd} for UE ID: {ue_id}, PRB: {prbAllocationForUe}")
-            self.log_control_decision(current_time, current_datetime, "USER", ue_id, "PRB_ALLOCATION", prbAllocationForUe)
-
-        # 2) for Slice B
-        prbAllocationSliceB = prbAllocations_xApp[1]
-        ueCountSliceB = totalUeCount - ueCountSliceA
-        ueAllocationsSliceB = self.computeAllocationsForSlice(prbAllocation=prbAllocationSliceB,
-                                                              ueCountSlice=ueCountSliceB)
-        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {prbAllocationSliceB} PRBs allocated to Slice B, split among UEs: {ueAllocationsSliceB}")
-        for i, prbAllocationForUe in enumerate(ueAllocationsSliceB):
-            ue = self.uesSliceB[i]
-            ue_id = ue['id']
-            sst = ue['sst']
-            sd = ue['sd']
-            current_time = time.time()
-            current_datetime = datetime.datetime.now()
-            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Sending RIC Control Request to E2 node ID: {e2_node_id} slice: {sd} for UE ID: {ue_id}, PRB: {prbAllocationForUe}")
-            #print("{} [{}] Send RIC Control Request to E2 node ID: {} slice: {} for UE ID: {}, PRB: {}".format(
-            #    current_datetime.strftime("%H:%M:%S"), self.xapp_id, e2_node_id, sd, ue_id, prbAllocationForUe))
-
-            # Log the message with the CentralController
-            self.controller.log_message(self.xapp_id, e2_node_id, ue_id, prbAllocationForUe, prbAllocationForUe,
-                                        current_time)
-            # Execute the RAN control
-            self.e2sm_rc.control_slice_level_prb_quota(e2_node_id, ue_id, min_prb_ratio=prbAllocationForUe,
-                                                       max_prb_ratio=prbAllocationForUe,
-                                                       dedicated_prb_ratio=100,
-                                                       ack_request=1, sst=sst, sd=sd)
-            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Sent RIC Control Request to E2 node ID: {e2_node_id} slice: {sd} for UE ID: {ue_id}, PRB: {prbAllocationForUe}")
-            self.log_control_decision(current_time, current_datetime, "USER", ue_id, "PRB_ALLOCATION", prbAllocationForUe)
+            return ueCountsPerSlice
+        return [1] * len(ueCountsPerSlice)
+
+    def defaultTopology(self, e2_node_id):
+        # Single E2 node with the slices and UEs configured in __init__
+        return [{
+            'e2_node_id': e2_node_id,
+            'slices': [dict(slice_, ues=[ue['id'] for ue in self.uesSliceA + self.uesSliceB
+                                         if ue['sd'] == slice_['sd']])
+                       for slice_ in self.slices],
+        }]
+
+    def activeTopology(self, topology):
+        """Restrict the configured topology to the UEs observed at each E2 node.
+
+        All slices but the first keep their configured UEs; the first slice (A) gets the remaining observed UEs.
+        """
+        activeNodes = []
+        for node in topology:
+            totalUeCount = self.getLatestUeCount(node['e2_node_id'])
+            if totalUeCount == 0:
+                continue
+            slices = node['slices']
+            ueCountOtherSlices = sum(len(slice_['ues']) for slice_ in slices[1:])
+            ueCountFirstSlice = max(0, totalUeCount - ueCountOtherSlices)
+            activeSlices = [dict(slices[0], ues=slices[0]['ues'][:ueCountFirstSlice])] + slices[1:]
+            activeNodes.append(dict(node, slices=activeSlices))
+        return activeNodes
+
+    def send_control_request(self, request):
+        # Runs on a control fan-out thread
+        request['sent_time'] = time.time()
+        control_start_ns = self.instrumentation.now()
+        ack = self.e2sm_rc.control_slice_level_prb_quota(request['e2_node_id'], request['ue_id'],
+                                                         min_prb_ratio=request['prb'], max_prb_ratio=request['prb'],
+                                                         dedicated_prb_ratio=100, ack_request=1,
+                                                         sst=request['sst'], sd=request['sd'])
+        self.instrumentation.record("control_request", control_start_ns)
+        return ack
+
+    def process(self, topology, totalPrbCount):
+        """Compute PRB allocations for every E2 node, slice and UE in topology and send them concurrently.
+
+        topology is a list of {'e2_node_id': ..., 'prb_count': optional, 'slices': [{'name': ..., 'sst': ...,
+        'sd': ..., 'ues': [UE IDs]}]}; totalPrbCount is used for nodes without a 'prb_count'.
+        """
+        requests = self.plan_round(topology, totalPrbCount)
+        if requests is None:
+            return
+        # Execute the RAN control for all E2 nodes concurrently
+        results = self.control_fanout.run_round(requests, self.send_control_request)
+        self.acknowledge_round(results, len(requests))
+        self.log_round(results)
 
-    @xAppBase.start_function
-    def start(self, e2_node_id, kpm_report_style, ue_ids, metric_names):
+    def plan_round(self, topology, totalPrbCount):
+        """Return the control requests of one round, None if the xApp is blocked by the CMF."""
+        # Check if xApp is blocked from performing control decisions due to CM measures
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Starting processing of PRB allocations.")
+        # Time from the last UE count update (end of indication handling) to this round starting
+        self.instrumentation.record("ue_count_to_process_start", self.last_ue_count_update_ns)
+        blockedTargets = self.verdict_targets()
+        if blockedTargets is not None and not blockedTargets:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Blocked by CMF. Ceasing control decisions.")
+            # Other xApps control the E2 nodes meanwhile, so resend everything once unblocked
+            self.quota_cache.invalidate()
+            return None
+
+        if blockedTargets:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Blocked by CMF for {len(blockedTargets)} targets. Proceeding with the others.")
+        else:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Not blocked by CMF. Proceeding to process PRB allocations.")
+        # Compute the allocations of all E2 nodes, slices and UEs in one batched call
+        prbCounts, sliceNodes, sliceWeights, sliceUeCounts = [], [], [], []
+        for nodeIndex, node in enumerate(topology):
+            ueCountsPerSlice = [len(slice_['ues']) for slice_ in node['slices']]
+            prbCounts.append(node.get('prb_count', totalPrbCount))
+            sliceNodes.extend([nodeIndex] * len(ueCountsPerSlice))
+            sliceWeights.extend(self.sliceWeights(ueCountsPerSlice))
+            sliceUeCounts.extend(ueCountsPerSlice)
+        sliceAllocations, ueAllocations = allocate(prbCounts, sliceNodes, sliceWeights, sliceUeCounts)
+
+        requests = []
+        withheldCount = 0
+        # Refreshes are timed from the planning of a round, so that send latency does not defer them a period
+        plannedTime = time.time()
+        sliceIndex = 0
+        ueIndex = 0
+        for node in topology:
+            e2_node_id = node['e2_node_id']
+            slices = node['slices']
+            prbAllocations_xApp = [int(prbs) for prbs in sliceAllocations[sliceIndex:sliceIndex + len(slices)]]
+            sliceIndex += len(slices)
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: E2 node ID: {e2_node_id} PRB Allocations: {prbAllocations_xApp}")
+
+            # Continue with PRB control based on calculated allocations
+            for slice_, prbAllocationSlice in zip(slices, prbAllocations_xApp):
+                ueAllocationsSlice = [int(prbs) for prbs in ueAllocations[ueIndex:ueIndex + len(slice_['ues'])]]
+                ueIndex += len(slice_['ues'])
+                print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {prbAllocationSlice} PRBs allocated to Slice {slice_['name']}, split among UEs: {ueAllocationsSlice}")
+                for ue_id, prbAllocationForUe in zip(slice_['ues'], ueAllocationsSlice):
+                    if blockedTargets and ("USER", f"{e2_node_id}/{ue_id}", "PRB_ALLOCATION") in blockedTargets:
+                        # Another xApp controls this UE meanwhile, so resend once the block is lifted
+                        self.quota_cache.forget(e2_node_id, slice_['sd'], ue_id)
+                        withheldCount += 1
+                        continue
+                    # Skip allocations unchanged since the last acknowledged request
+                    if not self.quota_cache.should_send(e2_node_id, slice_['sd'], ue_id, prbAllocationForUe,
+                                                        plannedTime):
+                        continue
+                    requests.append({'e2_node_id': e2_node_id, 'ue_id': ue_id, 'sst': slice_['sst'],
+                                     'sd': slice_['sd'], 'prb': prbAllocationForUe, 'planned_time': plannedTime})
+
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {len(requests)} control requests this round, "
+              f"{withheldCount} withheld by CMF verdicts")
+        return requests
+
+    def acknowledge_round(self, results, requestCount):
+        """Record the acknowledged quotas of a round in the quota cache and report the round."""
+        if self.first_control_time is None:
+            sent_times = [request['sent_time'] for node_results in results.values()
+                          for request, ack in node_results['acks']]
+            if sent_times:
+                self.first_control_time = min(sent_times)
+                self.report_startup("first_control", "First control request", self.first_control_time)
+        for e2_node_id, node_results in results.items():
+            for request, ack in node_results['acks']:
+                current_datetime = datetime.datetime.fromtimestamp(request['sent_time'])
+                self.quota_cache.acknowledge(e2_node_id, request['sd'], request['ue_id'], request['prb'],
+                                             request['planned_time'])
+                print(f"[{current_datetime}] xApp #{self.app_mode}: Sent RIC Control Request to E2 node ID: {e2_node_id} slice: {request['sd']} for UE ID: {request['ue_id']}, PRB: {request['prb']}")
+            for request, error in node_results['errors']:
+                print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: RIC Control Request to E2 node ID: {e2_node_id} for UE ID: {request['ue_id']} failed: {error}")
+            self.instrumentation.record_duration("node_round", node_results['round_time'] * 1e9)
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: E2 node ID: {e2_node_id} round time: {node_results['round_time'] * 1000:.1f} ms, "
+                  f"{len(node_results['acks'])} sent, {len(node_results['errors'])} failed")
+        counters = self.quota_cache.counters()
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {requestCount} control requests this round; "
+              f"total sent: {counters['sent']}, suppressed (unchanged): {counters['suppressed']}, "
+              f"refreshed: {counters['refreshed']}")
+
+    def report_startup(self, event, description, event_time):
+        """Report the time from process start to the first completed round or acknowledged control request."""
+        startup_time = event_time - self.process_start_time
+        self.instrumentation.record_duration(f"startup_to_{event}", startup_time * 1e9)
+        print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: {description} {startup_time:.3f} s "
+              f"after process start{' (fast start)' if self.fast_start else ''}")
+
+    def log_round(self, results):
+        """Log the acknowledged control requests of a round with the CentralController and as CMF decisions."""
+        for e2_node_id, node_results in results.items():
+            for request, ack in node_results['acks']:
+                ue_id = request['ue_id']
+                prbAllocationForUe = request['prb']
+                current_time = request['sent_time']
+                # Log the message with the CentralController
+                self.controller.log_message(self.xapp_id, e2_node_id, ue_id, prbAllocationForUe, prbAllocationForUe,
+                                            current_time)
+                # UE IDs are only unique per E2 node
+                self.log_control_decision(current_time, datetime.datetime.fromtimestamp(current_time), "USER",
+                                          f"{e2_node_id}/{ue_id}", "PRB_ALLOCATION", prbAllocationForUe)
+        if self.decision_store is not None:
+            self.decision_store.flush()
+
+    def subscribe(self, topology, kpm_report_style, metric_names):
         report_period = 1000
         granul_period = 1000
-        self.setup_subscription(e2_node_id)
-        subscription_callback = lambda agent, sub, hdr, msg: self.my_subscription_callback(agent, sub, hdr, msg,
-                                                                                           kpm_report_style, None)
+        subscription_callback = self.subscription_callback(kpm_report_style)
 
         # Dummy condition that is always satisfied
         matchingUeConds = [{'testCondInfo': {'testType': ('ul-rSRP', 'true'), 'testExpr': 'lessthan',
                                              'testValue': ('valueInt', 1000)}}]
 
-        print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(e2_node_id,
-                                                                                                      kpm_report_style,
-                                                                                                      metric_names))
-        self.e2sm_kpm.subscribe_report_service_style_4(e2_node_id, report_period, matchingUeConds, metric_names,
-                                                       granul_period, subscription_callback)
+        for node in topology:
+            self.setup_subscription(node['e2_node_id'])
+            print("Subscribe to E2 node ID: {}, RAN func: e2sm_kpm, Report Style: {}, metrics: {}".format(
+                node['e2_node_id'], kpm_report_style, metric_names))
+            self.e2sm_kpm.subscribe_report_service_style_4(node['e2_node_id'], report_period, matchingUeConds,
+                                                           metric_names, granul_period, subscription_callback)
+
+    def start_round(self, reason, deadline, lateness):
+        """Print the start of a round; returns its start time, or None if no UEs are observed yet."""
+        totalUeCount = self.getLatestUeCount()  # get from network observation
+        if totalUeCount == 0:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: No UEs detected based on E2 indication message, waiting...")
+            return None
+
+        start_processing_time = time.time()
+        print(f"[{start_processing_time}] xApp #{self.app_mode}: {reason} round for slot {deadline:.3f} "
+              f"(period {self.scheduler.period} s, phase {self.scheduler.phase} s), late by {lateness * 1000:.1f} ms")
+        return start_processing_time
+
+    def finish_round(self, start_processing_time, round_start_ns):
+        self.instrumentation.record("process_round", round_start_ns)
+
+        # Record metrics
+        self.processed_messages += 1
+        end_processing_time = time.time()
+        latency = end_processing_time - start_processing_time
+        self.round_stats.add(latency)
+        if self.first_round_time is None:
+            self.first_round_time = end_processing_time
+            self.report_startup("first_round", "First round completed", end_processing_time)
+
+        if self.fast_start:
+            with self.ue_counts_lock:
+                ue_counts = dict(self.latestUeCounts)
+            if self.pipeline is not None:
+                # File writes belong to the log stage, off the event loop
+                self.pipeline.submit("log", ("snapshot", ue_counts, self.quota_cache.snapshot()))
+            else:
+                self.save_snapshot(ue_counts, self.quota_cache.snapshot())
+
+        # Print metrics periodically
+        if self.processed_messages % 10 == 0:
+            self.print_metrics()
+
+    def save_snapshot(self, ue_counts, quotas):
+        try:
+            save_snapshot(self.snapshot_path, ue_counts, quotas)
+        except OSError as e:
+            print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: Snapshot {self.snapshot_path} not saved: {e}")
 
+    @xAppBase.start_function
+    def start(self, e2_node_id, kpm_report_style, ue_ids, metric_names):
+        topology = self.topology or self.defaultTopology(e2_node_id)
+
+        if self.pipeline is not None:
+            # Subscribe from inside the event loop, so that the first indications find the decode queue
+            handlers = {"decode": self.decode_stage, "allocate": self.allocate_stage,
+                        "dispatch": self.dispatch_stage, "log": self.log_stage}
+            self.pipeline.run(handlers, [lambda: self.subscribe_async(topology, kpm_report_style, metric_names),
+                                         lambda: self.schedule_rounds(topology)])
+        elif self.fast_start:
+            # Subscribe on a separate thread; the first round only needs UE counts, which the snapshot provides
+            subscriber = threading.Thread(target=self.subscribe, args=(topology, kpm_report_style, metric_names),
+                                          name="kpm-subscribe", daemon=True)
+            subscriber.start()
+            self.run_rounds(topology)
+            subscriber.join()
+        else:
+            self.subscribe(topology, kpm_report_style, metric_names)
+            self.run_rounds(topology)
+
+        # Flush measurements still queued for the log file
+        self.measurement_logger.stop()
+        self.control_fanout.shutdown()
+        if self.decision_store is not None:
+            self.decision_store.close()
+        if self.bus is not None:
+            self.bus.close()
+
+    def run_rounds(self, topology):
         while self.running:
-            totalSliceCount = 2  # always 2 slices (A and B)
-            totalPrbCount = 51  # always 51 PRBs for entire RAN
-            totalUeCount = self.getLatestUeCount()  # get from network observation
-            ueCountSliceA = totalUeCount - 1  # assumed 1 UEs in slices other than A (i.e., in slice B)
-
-            if totalUeCount == 0:
-                print(f"[{datetime.datetime.now()}] xApp #{self.app_mode}: No UEs detected based on E2 indication message, waiting...")
-                time.sleep(1)
+            # Sleep until this xApp's next slot, or until a KPM indication changes the UE count
+            reason, deadline, lateness = self.scheduler.wait()
+            if reason == 'stopped' or not self.running:
+                break
+
+            totalPrbCount = 51  # 51 PRBs per E2 node, unless set per node in the topology
+            start_processing_time = self.start_round(reason, deadline, lateness)
+            if start_processing_time is None:
                 continue
 
-            start_processing_time = time.time()
-            if app_mode == 1:
-                execution_trigger = 0
-            if app_mode == 2:
-                execution_trigger = 5
-
-            execution_timer = math.floor(start_processing_time % 10)
-
-            print(f"[{start_processing_time}] xApp #{self.app_mode}: execution timer is: {execution_timer} with execution trigger: {execution_trigger}")
-
-            if (execution_timer == execution_trigger):
-                self.process(totalSliceCount, totalPrbCount, totalUeCount, ueCountSliceA)
+            round_start_ns = self.instrumentation.now()
+            self.process(self.activeTopology(topology), totalPrbCount)
+            self.finish_round(start_processing_time, round_start_ns)
 
-                # Record metrics
-                self.processed_messages += 1
-                end_processing_time = time.time()
-                latency = end_processing_time - start_processing_time
-                self.latencies.append(latency)
+    async def subscribe_async(self, topology, kpm_report_style, metric_names):
+        await self.pipeline.loop.run_in_executor(None, self.subscribe, topology, kpm_report_style, metric_names)
 
-                # Print metrics periodically
-                if self.processed_messages % 10 == 0:
-                    self.print_metrics()
-
-            time.sleep(1)
+    async def schedule_rounds(self, topology):
+        # The scheduler sleeps on a worker thread, so the event loop keeps serving the other stages
+        loop = self.pipeline.loop
+        while self.running:
+            reason, deadline, lateness = await loop.run_in_executor(None, self.scheduler.wait)
+            if reason == 'stopped' or not self.running:
+                break
+            await self.pipeline.put("allocate", (reason, deadline, lateness, topology))
+
+    async def decode_stage(self, indication):
+        # UE counts are only updated on the event loop, so the allocate stage always sees consistent counts
+        self.my_subscription_callback(*indication)
+
+    async def allocate_stage(self, slot):
+        reason, deadline, lateness, topology = slot
+        start_processing_time = self.start_round(reason, deadline, lateness)
+        if start_processing_time is None:
+            return
+        round_start_ns = self.instrumentation.now()
+        totalPrbCount = 51  # 51 PRBs per E2 node, unless set per node in the topology
+        requests = self.plan_round(self.activeTopology(topology), totalPrbCount)
+        if requests is None:
+            self.finish_round(start_processing_time, round_start_ns)
+            return
+        await self.pipeline.put("dispatch", (start_processing_time, round_start_ns, requests))
+
+    async def dispatch_stage(self, round_):
+        start_processing_time, round_start_ns, requests = round_
+        # Control requests are sent from the fan-out threads; a slow ack delays neither decoding nor logging
+        results = await self.pipeline.loop.run_in_executor(None, self.control_fanout.run_round, requests,
+                                                           self.send_control_request)
+        self.acknowledge_round(results, len(requests))
+        await self.pipeline.put("log", ("decisions", results))
+        self.finish_round(start_processing_time, round_start_ns)
+
+    async def log_stage(self, entry):
+        if entry[0] == "measurements":
+            self.log_measurements(*entry[1:])
+        elif entry[0] == "snapshot":
+            await self.pipeline.loop.run_in_executor(None, self.save_snapshot, *entry[1:])
+        else:
+            # Decision files are written off the event loop, so a disk stall only backs up this stage
+            await self.pipeline.loop.run_in_executor(None, self.log_round, entry[1])
+
+    def stop(self):
+        # Wake the main loop, which may be waiting for its next slot
+        self.scheduler.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        super(MyXapp, self).stop()
 
     def print_metrics(self):
         elapsed_time = time.time() - self.start_time
         throughput = self.processed_messages / elapsed_time
-        average_latency = sum(self.latencies) / len(self.latencies) if self.latencies else 0
-        metrics = (f"Throughput: {throughput:.2f} messages/sec\n"
-                   f"Average Latency: {average_latency:.4f} seconds")
+        stats = self.round_stats
+        metrics = (f"Throughput: {throughput:.2f} messages/sec, "
+                   f"last {stats.window_rate.window:.0f} s: {stats.rate():.2f} messages/sec\n"
+                   f"Average Latency: {stats.mean:.4f} seconds (stddev {stats.stddev:.4f}, "
+                   f"p50 {stats.quantile(0.5):.4f}, p99 {stats.quantile(0.99):.4f}, max {stats.max:.4f})")
         print(metrics)
         logging.info(metrics)
+        if self.pipeline is not None:
+            for stage, stage_metrics in self.pipeline.snapshot().items():
+                print(f"Stage {stage}: queue depth {stage_metrics['depth']} (max {stage_metrics['max_depth']}), "
+                      f"dropped {stage_metrics['dropped']}, lag p50 {stage_metrics['lag']['p50']:.2f} ms, "
+                      f"p99 {stage_metrics['lag']['p99']:.2f} ms")
 
 
 if __name__ == '__main__':
@@ -288,7 +641,43 @@ if __name__ == '__main__':
     parser.add_argument("--ue_ids", type=str, default='0', help="UE ID")
     parser.add_argument("--metrics", type=str, default='DRB.RlcSduTransmittedVolumeDL',
                         help="Metrics name as comma-separated string")
-    parser.add_argument("--app_mode", type=int, default=1, help="xApp mode; 1 or 2")
+    parser.add_argument("--app_mode", type=int, default=1,
+                        help="xApp mode; 1 prioritizes Slice A, any other mode shares PRBs equally among slices")
+    parser.add_argument("--bus_path", type=str, default='',
+                        help="Decision bus socket path; if empty, decision CSV and block files are used")
+    parser.add_argument("--log_format", type=str, default='csv', choices=['csv', 'binary', 'sqlite'],
+                        help="KPM measurement log format")
+    parser.add_argument("--quiet_metrics", action="store_true", help="Do not print every KPM metric to the console")
+    parser.add_argument("--no_instrumentation", action="store_true",
+                        help="Start with latency instrumentation disabled (can be enabled over HTTP)")
+    parser.add_argument("--metrics_window", type=float, default=60.0,
+                        help="Window in seconds for the throughput printed with the metrics")
+    parser.add_argument("--topology", type=str, default='',
+                        help="JSON file with the E2 nodes, slices and UEs to control (default: --e2_node_id only)")
+    parser.add_argument("--control_workers", type=int, default=16, help="Threads sending RIC control requests")
+    parser.add_argument("--max_in_flight_per_node", type=int, default=4,
+                        help="Maximum concurrent RIC control requests per E2 node")
+    parser.add_argument("--quota_refresh_interval", type=float, default=10.0,
+                        help="Resend unchanged PRB quotas after this many seconds; 0 sends every quota every round")
+    parser.add_argument("--execution_period", type=float, default=10.0, help="Seconds between control rounds")
+    parser.add_argument("--execution_phase", type=float, default=None,
+                        help="Offset of this xApp's rounds within the period "
+                             "(default: (app_mode - 1) * execution_period / xapp_count)")
+    parser.add_argument("--xapp_count", type=int, default=2,
+                        help="Number of xApps sharing the period, for the default execution phases")
+    parser.add_argument("--trigger_on_ue_change", action="store_true",
+                        help="Also run a round as soon as a KPM indication changes the UE count")
+    parser.add_argument("--decision_store", type=str, default='',
+                        help="SQLite decision store shared with the CMF, instead of xapp_decisions_N.csv")
+    parser.add_argument("--async_runtime", action="store_true",
+                        help="Run decoding, allocation, control dispatch and logging as asyncio tasks")
+    parser.add_argument("--stage_queue_size", type=int, default=100,
+                        help="Bounded queue size of each asyncio runtime stage")
+    parser.add_argument("--fast_start", action="store_true",
+                        help="Restore UE counts and sent PRB quotas from xapp_N_snapshot.json and subscribe to KPM "
+                             "while waiting for the first slot")
+    parser.add_argument("--snapshot_max_age", type=float, default=300.0,
+                        help="Ignore fast-start snapshots older than this many seconds")
 
     args = parser.parse_args()
     config = args.config
@@ -300,11 +689,21 @@ if __name__ == '__main__':
     kpm_report_style = args.kpm_report_style
     metrics = args.metrics.split(",")
     app_mode = args.app_mode
+    topology = None
+    if args.topology:
+        with open(args.topology) as f:
+            topology = json.load(f)
     # Create CentralController
+    from central_controller import CentralController
     controller = CentralController()
 
     # Create MyXapp with controller and Flask server URL
-    myXapp = MyXapp(config, args.http_server_port, args.rmr_port, controller, xapp_id, flask_server_url, app_mode)
+    myXapp = MyXapp(config, args.http_server_port, args.rmr_port, controller, xapp_id, flask_server_url, app_mode,
+                    args.bus_path, args.log_format, args.quiet_metrics, not args.no_instrumentation,
+                    args.metrics_window, topology, args.control_workers, args.max_in_flight_per_node,
+                    args.quota_refresh_interval, args.execution_period, args.execution_phase,
+                    args.trigger_on_ue_change, args.async_runtime, args.stage_queue_size,
+                    args.decision_store, args.fast_start, args.snapshot_max_age, args.xapp_count)
     # myXapp.e2sm_rc.set_ran_func_id(ran_func_id)
     myXapp.e2sm_kpm.set_ran_func_id(ran_func_id)
 